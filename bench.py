@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench.py ― 整形パイプラインのベンチマークと性能回帰チェック
+
+● 合成原稿（1 KB 〜 50 MB）を seed 固定で生成
+   ├ plain     : 見出し・太字・引用かっこ・HTML・日付を含む普通の原稿
+   ├ bold      : '**' だらけ（'***' や閉じ忘れも混ぜる）
+   ├ parens    : 対応の崩れた '(' ')' と [] 引用
+   ├ html      : 入れ子の HTML タグ（閉じ忘れあり）
+   └ fullwidth : 全角数字の日付・文末番号
+● clean_engine の各プロファイル（remove.py = note / format_gemini.py = gemini）
+   を段ごと・全体で計測
+   └ スループット（MB/s）、p50 / p99、tracemalloc のピークメモリ
+● 結果は JSON に保存し、基準 JSON と比べて遅くなった段があれば失敗
+● --sections N : 節ごとの並列整形（clean_text_sections）を逐次と比べる
+   └ 所要時間・速度向上率と、結果が逐次と一致するかを表示
+
+  python bench.py                              # → bench_results.json
+  python bench.py --sizes 1K,64K --variants plain,bold
+  python bench.py --compare bench_baseline.json --threshold 1.25
+  python bench.py --sections 4 --sizes 4M,16M
+  （make bench / make bench-baseline / make bench-compare）
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+
+import clean_engine
+
+SIZES    = ['1K', '16K', '256K', '4M', '50M']
+SECTION_SIZES = ['4M', '16M']                     # --sections の既定サイズ
+VARIANTS = ['plain', 'bold', 'parens', 'html', 'fullwidth']
+UNITS    = {'K': 2**10, 'M': 2**20}
+
+
+# -------------------------------------------------------------
+# 合成原稿
+# -------------------------------------------------------------
+WORDS = ['SUBARU', 'トヨタ自動車', '業績', '売上高', '営業利益', '米国市場', 'EV戦略',
+         'は', 'が', 'を', 'に', 'と', 'の', '前年同期比で', '大きく', '改善しました',
+         '為替の影響', 'により', '減益となりました', '今後の見通し']
+
+def _sentence(rng: random.Random, variant: str) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(4, 12))]
+    r = rng.random()
+    if variant == 'bold':
+        words = [f"**{w}**" if rng.random() < 0.4 else w for w in words]
+        if r < 0.2:
+            words.append(rng.choice(['***', '**', '*', '** 空白 **']))
+    elif variant == 'parens':
+        if r < 0.5:
+            words.append(rng.choice(['(', ')', '((注)', '(出典 [1])', '[2]', '( )', ')）']))
+    elif variant == 'html':
+        depth = rng.randint(1, 6)
+        tags = [rng.choice(['b', 'i', 'span', 'a']) for _ in range(depth)]
+        inner = ''.join(words)
+        opened = ''.join(f'<{t} class="x">' for t in tags)
+        closed = ''.join(f'</{t}>' for t in reversed(tags[rng.random() < 0.2:]))
+        return opened + inner + closed + ('<br>' if r < 0.3 else '') + '。'
+    elif variant == 'fullwidth':
+        if r < 0.3:
+            words.insert(0, f"{rng.randint(1, 12)}月{rng.randint(1, 28)}日時点".translate(
+                str.maketrans('0123456789', '０１２３４５６７８９')))
+        if r > 0.6:
+            return ''.join(words) + f" {'８９'[rng.random() < 0.5]}。"
+    else:
+        if r < 0.15:
+            words[rng.randrange(len(words))] = f"**{rng.choice(WORDS)}**"
+        elif r < 0.25:
+            words.append('(https://example.com/a)')
+        elif r < 0.3:
+            words.append('<b>強調</b>')
+        elif r < 0.35:
+            words.insert(0, '6月3日時点')
+    return ''.join(words) + '。'
+
+def make_corpus(size: int, variant: str, seed: int = 0) -> str:
+    """utf-8 で size バイト前後の原稿（前書き＋見出しブロックの繰り返し）"""
+    rng = random.Random(f"{variant}:{seed}")
+    parts = ["了解しました。調査を進めます。\n\n", "# 合成原稿のタイトル\n\n"]
+    total = sum(len(p.encode('utf-8')) for p in parts)
+    while total < size:
+        if rng.random() < 0.15:
+            part = f"## {rng.choice(WORDS)}と{rng.choice(WORDS)}\n\n"
+        else:
+            part = ''.join(_sentence(rng, variant) for _ in range(rng.randint(1, 4))) + '\n\n'
+        parts.append(part)
+        total += len(part.encode('utf-8'))
+    return ''.join(parts)
+
+
+# -------------------------------------------------------------
+# 段の列（各段は 前段の出力 → 出力 の関数）
+# -------------------------------------------------------------
+def profile_stages(profile: 'clean_engine.Profile'):
+    """プロファイルの clean_text を段に分解（ブロック列の text を受け渡す）"""
+    def blocks_of(texts):
+        return [clean_engine.Block(t) for t in texts]
+
+    def rule_stage(rule):
+        return lambda texts: [blk.text for blk in rule.run(blocks_of(texts))]
+
+    def stages(raw: str) -> list:
+        rules = profile.rules(profile.closers((raw,)))
+        return ([('parse_blocks', lambda text: [blk.text for blk in clean_engine.parse_blocks(text)])]
+                + [(rule.stage_name, rule_stage(rule)) for rule in rules]
+                + [('serialize', lambda texts: clean_engine.serialize(blocks_of(texts)))])
+    return stages
+
+# 名前は基準 JSON との互換のためスクリプト名のまま
+BENCH_PROFILES = {'remove': clean_engine.PROFILES['note'],
+                  'format_gemini': clean_engine.PROFILES['gemini']}
+PIPELINES = {name: (profile.clean_text, profile_stages(profile))
+             for name, profile in BENCH_PROFILES.items()}
+
+
+# -------------------------------------------------------------
+# 計測
+# -------------------------------------------------------------
+def _repeat(fn, arg, budget: float, min_runs: int = 3, max_runs: int = 50) -> list:
+    """budget 秒を目安に繰り返し、各回の所要時間（秒）を返す"""
+    times = []
+    start = time.perf_counter()
+    while len(times) < min_runs or (len(times) < max_runs
+                                    and time.perf_counter() - start < budget):
+        t = time.perf_counter()
+        fn(arg)
+        times.append(time.perf_counter() - t)
+    return times
+
+def _percentile(times: list, q: float) -> float:
+    ordered = sorted(times)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def _summary(times: list, nbytes: int) -> dict:
+    p50 = _percentile(times, 0.50)
+    return {'runs': len(times),
+            'p50_ms': p50 * 1000,
+            'p99_ms': _percentile(times, 0.99) * 1000,
+            'mb_per_s': nbytes / 2**20 / p50 if p50 else float('inf')}
+
+def _peak_mb(fn, arg) -> float:
+    tracemalloc.start()
+    try:
+        fn(arg)
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+def bench_one(name: str, raw: str, budget: float) -> dict:
+    full, stages = PIPELINES[name]
+    nbytes = len(raw.encode('utf-8'))
+    result = {'full': _summary(_repeat(full, raw, budget), nbytes), 'stages': {}}
+    result['full']['peak_mb'] = _peak_mb(full, raw)
+    value = raw
+    for stage, fn in stages(raw):
+        times = _repeat(fn, value, budget / 4)
+        result['stages'][stage] = _summary(times, nbytes)
+        value = fn(value)
+    return result
+
+def parse_size(text: str) -> int:
+    text = text.strip().upper()
+    return int(float(text[:-1]) * UNITS[text[-1]]) if text[-1] in UNITS else int(text)
+
+def run(sizes: list, variants: list, pipelines: list, budget: float) -> dict:
+    results = {'meta': {'python': platform.python_version(), 'machine': platform.machine(),
+                        'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+               'cases': {}}
+    print(f"{'pipeline':<14} {'variant':<10} {'size':>6} {'MB/s':>8} "
+          f"{'p50 ms':>10} {'p99 ms':>10} {'peak MB':>8}")
+    for size in sizes:
+        for variant in variants:
+            raw = make_corpus(parse_size(size), variant)
+            for name in pipelines:
+                res = bench_one(name, raw, budget)
+                results['cases'][f"{name}/{variant}/{size}"] = res
+                full = res['full']
+                print(f"{name:<14} {variant:<10} {size:>6} {full['mb_per_s']:8.2f} "
+                      f"{full['p50_ms']:10.2f} {full['p99_ms']:10.2f} {full['peak_mb']:8.1f}")
+    return results
+
+
+# -------------------------------------------------------------
+# 節ごとの並列整形と逐次の比較
+# -------------------------------------------------------------
+def run_sections(sizes: list, variants: list, pipelines: list, workers: int,
+                 budget: float) -> dict:
+    results = {'meta': {'python': platform.python_version(), 'machine': platform.machine(),
+                        'cpus': os.cpu_count(), 'workers': workers,
+                        'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+               'sections': {}}
+    print(f"{'pipeline':<14} {'variant':<10} {'size':>6} {'節数':>4} "
+          f"{'serial ms':>10} {'parallel ms':>12} {'speedup':>8}  一致")
+    for size in sizes:
+        for variant in variants:
+            raw = make_corpus(parse_size(size), variant)
+            texts = [blk.text for blk in clean_engine.parse_blocks(raw)]
+            count = len(clean_engine.split_sections(texts, workers))
+            for name in pipelines:
+                profile = BENCH_PROFILES[name]
+                def parallel(text):
+                    return profile.clean_text_sections(text, workers)
+                same = parallel(raw) == profile.clean_text(raw)
+                serial = _percentile(_repeat(profile.clean_text, raw, budget, 2, 10), 0.5)
+                para   = _percentile(_repeat(parallel, raw, budget, 2, 10), 0.5)
+                results['sections'][f"{name}/{variant}/{size}"] = {
+                    'sections': count, 'serial_ms': serial * 1000,
+                    'parallel_ms': para * 1000, 'speedup': serial / para, 'identical': same}
+                print(f"{name:<14} {variant:<10} {size:>6} {count:>4} {serial * 1000:10.1f} "
+                      f"{para * 1000:12.1f} {serial / para:7.2f}x  {'✔' if same else '✖'}")
+    return results
+
+
+# -------------------------------------------------------------
+# 基準との比較
+# -------------------------------------------------------------
+def compare(base: dict, new: dict, threshold: float, floor_ms: float) -> list:
+    """p50 が基準の threshold 倍を超えた (ケース, 段, 基準 ms, 今回 ms) の一覧
+    floor_ms 未満の差は計測誤差として無視する"""
+    regressions = []
+    for case, res in new['cases'].items():
+        ref = base['cases'].get(case)
+        if ref is None:
+            continue
+        rows = [('(full)', ref['full'], res['full'])]
+        rows += [(st, ref['stages'][st], res['stages'][st])
+                 for st in res['stages'] if st in ref['stages']]
+        for stage, old, cur in rows:
+            if cur['p50_ms'] > old['p50_ms'] * threshold and \
+                    cur['p50_ms'] - old['p50_ms'] > floor_ms:
+                regressions.append((case, stage, old['p50_ms'], cur['p50_ms']))
+    return regressions
+
+
+def main(argv: list) -> int:
+    parser = argparse.ArgumentParser(description="整形パイプラインのベンチマーク")
+    parser.add_argument('--sizes', default=None,
+                        help=f"既定: {','.join(SIZES)}（--sections では {','.join(SECTION_SIZES)}）")
+    parser.add_argument('--variants', default=','.join(VARIANTS))
+    parser.add_argument('--pipelines', default=','.join(PIPELINES))
+    parser.add_argument('--budget', type=float, default=1.0,
+                        help="1 ケースあたりの計測時間の目安（秒）")
+    parser.add_argument('--out', default='bench_results.json')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help="基準 JSON。同じサイズ・種類で計測して比較する")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="p50 がこの倍率を超えたら回帰とみなす")
+    parser.add_argument('--floor-ms', type=float, default=0.5,
+                        help="これ未満の差は計測誤差として無視（ミリ秒）")
+    parser.add_argument('--sections', type=int, metavar='N',
+                        help="節ごとの並列整形（N プロセス）を逐次と比べる")
+    args = parser.parse_args(argv)
+
+    sizes = (args.sizes or ','.join(SECTION_SIZES if args.sections else SIZES)).split(',')
+    variants, pipelines = args.variants.split(','), args.pipelines.split(',')
+    if args.sections:
+        results = run_sections(sizes, variants, pipelines, args.sections, args.budget)
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=1)
+        print(f"✔ 結果: {args.out}")
+        return 0 if all(r['identical'] for r in results['sections'].values()) else 1
+
+    base = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            base = json.load(f)
+        keys = [case.split('/') for case in base['cases']]       # 基準と同じケースだけ
+        pipelines = list(dict.fromkeys(k[0] for k in keys))
+        variants  = list(dict.fromkeys(k[1] for k in keys))
+        sizes     = list(dict.fromkeys(k[2] for k in keys))
+
+    results = run(sizes, variants, pipelines, args.budget)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=1)
+    print(f"✔ 結果: {args.out}")
+
+    if base is None:
+        return 0
+    regressions = compare(base, results, args.threshold, args.floor_ms)
+    for case, stage, old, cur in regressions:
+        print(f"✖ {case:<32} {stage:<24} {old:10.2f} ms → {cur:10.2f} ms ({cur / old:.2f}x)")
+    if regressions:
+        print(f"✖ {len(regressions)} 件の段が基準の {args.threshold:.2f} 倍を超えました")
+        return 1
+    print(f"✔ 回帰なし（閾値 {args.threshold:.2f} 倍）")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
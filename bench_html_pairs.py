@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_html_pairs.py ― strip_html_pairs の計測
+
+1) 入れ子の深さ   : '<b>' * d + 本文 + '</b>' * d
+2) 閉じ忘れタグ   : '<b>本文' * d（閉じタグなし）
+3) 文書サイズ     : 整ったペアタグを含む段落を n 個
+
+従来の反復 sub（_strip_html_pairs_slow）と 1 回走査版を並べ、
+結果が一致することも確認する。線形なら d・n を倍にすると時間もほぼ倍。
+"""
+
+import sys
+import time
+
+import clean_engine
+
+
+def _time(fn, text: str) -> float:
+    start = time.perf_counter()
+    fn(text)
+    return (time.perf_counter() - start) * 1000
+
+
+def run(label: str, make, sizes, slow_limit: int) -> None:
+    print(f"\n=== {label} =============================")
+    print(f"{'size':>8} {'chars':>10} {'slow ms':>10} {'fast ms':>10}")
+    for n in sizes:
+        text = make(n)
+        fast = _time(clean_engine.strip_html_pairs, text)
+        if n <= slow_limit:
+            assert clean_engine.strip_html_pairs(text) == clean_engine._strip_html_pairs_slow(text)
+            slow = f"{_time(clean_engine._strip_html_pairs_slow, text):10.1f}"
+        else:
+            slow = f"{'-':>10}"
+        print(f"{n:>8} {len(text):>10} {slow} {fast:10.1f}")
+
+
+if __name__ == '__main__':
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    run("入れ子の深さ",
+        lambda d: '<b>' * d + '本文' + '</b>' * d,
+        [500 * scale * 2 ** k for k in range(5)], 2000 * scale)
+    run("閉じ忘れタグ",
+        lambda d: '<b>本文です。' * d,
+        [500 * scale * 2 ** k for k in range(5)], 2000 * scale)
+    run("文書サイズ",
+        lambda n: '## 見出し\n<b>太字</b>の<span class="x">段落</span>です。<br>\n' * n,
+        [1_000 * scale * 2 ** k for k in range(6)], 4_000 * scale)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+clean_cache.py — clean_text 結果の永続キャッシュ（内容アドレス＋LRU）
+────────────────────────────────────────
+● キー = sha256(プロファイル, パイプライン版, 日付文字列, 原稿)
+   ├ パイプライン版 : 整形規則を定義するソースファイルのハッシュ
+   │                  （規則を 1 文字でも変えれば自動的に別キー）
+   └ 日付文字列     : 「X月X日時点」の置換先（日付が変われば別キー）
+● SQLite 1 ファイルを CLI（remove.py / format_gemini.py）と webapp で共有
+● 合計サイズが上限を超えたら最終利用が古い順に削除（LRU）
+● ヒット／ミス回数を記録（python clean_cache.py で表示）
+● ヒット時は SELECT 1 回だけ。最終利用時刻と回数はメモリに溜め、
+   put のとき・FLUSH_EVERY 件／FLUSH_SECONDS 秒ごと・終了時にまとめて書く
+   （読み出しが書き込みロックを取り合わない。LRU の順序が少し遅れるだけ）
+● 環境変数 CLEAN_CACHE=<パス> で保存先変更、CLEAN_CACHE=off で無効
+────────────────────────────────────────
+"""
+
+import os
+import sys
+import time
+import hashlib
+from typing import Optional
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            '.cache', 'clean.sqlite3')
+DEFAULT_MAX_BYTES = 64 * 2**20
+FLUSH_EVERY       = 256       # 溜めた最終利用時刻がこれだけあれば書く
+FLUSH_SECONDS     = 5.0       # 前回書いてからこれだけ経っていれば書く
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key   TEXT PRIMARY KEY,
+    value TEXT    NOT NULL,
+    size  INTEGER NOT NULL,
+    used  REAL    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_used ON entries(used);
+CREATE TABLE IF NOT EXISTS counters (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0);
+"""
+
+
+def source_version(*paths: str) -> str:
+    """整形規則を定義するファイル群の内容ハッシュ（パイプライン版）"""
+    h = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+class CleanCache:
+    __slots__ = ('path', 'max_bytes', 'hits', 'misses', '_conn', '_pid',
+                 '_used', '_counts', '_flushed')
+
+    def __init__(self, path: str = DEFAULT_PATH,
+                 max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = self.misses = 0               # このプロセス内の回数
+        self._conn, self._pid = None, None
+        self._pending_reset()
+
+    @staticmethod
+    def key(raw: str, profile: str, version: str, date: str) -> str:
+        h = hashlib.sha256(f"{profile}\0{version}\0{date}\0".encode('utf-8'))
+        h.update(raw.encode('utf-8'))
+        return h.hexdigest()
+
+    def _db(self) -> 'sqlite3.Connection':
+        if self._conn is None or self._pid != os.getpid():   # fork 後は開き直す
+            import sqlite3                        # 初回参照まで遅らせる（起動を軽く）
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            if self._conn is None:
+                import atexit
+                atexit.register(self.flush)
+            else:                                 # fork 前に溜めた分は親が書く
+                self._pending_reset()
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    # -- 最終利用時刻・回数（メモリに溜めてまとめて書く） ------------
+    def _pending_reset(self) -> None:
+        self._used = {}                           # キー → 最終利用時刻
+        self._counts = {'hits': 0, 'misses': 0}
+        self._flushed = time.monotonic()
+
+    def _write_pending(self, db: 'sqlite3.Connection') -> None:
+        """溜めた分をトランザクション db の中で書く"""
+        used, counts = self._used, self._counts
+        self._pending_reset()
+        if used:
+            db.executemany('UPDATE entries SET used = ? WHERE key = ?',
+                           [(t, key) for key, t in used.items()])
+        db.executemany('UPDATE counters SET value = value + ? WHERE name = ?',
+                       [(n, name) for name, n in counts.items() if n])
+
+    def flush(self) -> None:
+        if not self._used and not any(self._counts.values()):
+            return
+        import sqlite3
+        try:
+            db = self._db()
+            with db:
+                self._write_pending(db)
+        except (sqlite3.Error, OSError):
+            pass
+
+    def get(self, key: str) -> Optional[str]:
+        import sqlite3                            # 読み込み済みなら辞書参照だけ
+        try:
+            row = self._db().execute('SELECT value FROM entries WHERE key = ?',
+                                     (key,)).fetchone()
+        except (sqlite3.Error, OSError):
+            row = None                            # キャッシュ不調でも整形は続ける
+        if row is None:
+            self.misses += 1
+            self._counts['misses'] += 1
+        else:
+            self.hits += 1
+            self._counts['hits'] += 1
+            self._used[key] = time.time()
+        if len(self._used) >= FLUSH_EVERY or time.monotonic() - self._flushed >= FLUSH_SECONDS:
+            self.flush()
+        return None if row is None else row[0]
+
+    def put(self, key: str, value: str) -> None:
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        import sqlite3
+        try:
+            db = self._db()
+            with db:
+                self._write_pending(db)           # 追い出しの前に最終利用時刻を反映
+                db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)',
+                           (key, value, size, time.time()))
+                total = db.execute('SELECT SUM(size) FROM entries').fetchone()[0]
+                if total > self.max_bytes:
+                    self._evict(db, total - self.max_bytes)
+        except (sqlite3.Error, OSError):
+            pass
+
+    def _evict(self, db: 'sqlite3.Connection', excess: int) -> None:
+        """最終利用が古い順に excess バイト分を削除"""
+        doomed = []
+        for key, size in db.execute('SELECT key, size FROM entries ORDER BY used'):
+            doomed.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        db.executemany('DELETE FROM entries WHERE key = ?', doomed)
+
+    def cached(self, fn, raw: str, profile: str, version: str, date: str) -> str:
+        """fn(raw) の結果をキャッシュ経由で返す"""
+        key = self.key(raw, profile, version, date)
+        value = self.get(key)
+        if value is None:
+            value = fn(raw)
+            self.put(key, value)
+        return value
+
+    def stats(self) -> dict:
+        self.flush()
+        db = self._db()
+        counters = dict(db.execute('SELECT name, value FROM counters'))
+        entries, size = db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        return {'hits': counters['hits'], 'misses': counters['misses'],
+                'entries': entries, 'bytes': size, 'max_bytes': self.max_bytes}
+
+    def clear(self) -> None:
+        db = self._db()
+        self._pending_reset()
+        with db:
+            db.execute('DELETE FROM entries')
+            db.execute('UPDATE counters SET value = 0')
+
+
+def open_cache() -> Optional[CleanCache]:
+    """環境変数 CLEAN_CACHE に従って開く（off なら None）"""
+    path = os.environ.get('CLEAN_CACHE', DEFAULT_PATH)
+    if path.lower() in ('', '0', 'off', 'no'):
+        return None
+    return CleanCache(path)
+
+
+if __name__ == '__main__':
+    cache = open_cache()
+    if cache is None:
+        print("キャッシュは無効です（CLEAN_CACHE=off）")
+        sys.exit(0)
+    if sys.argv[1:] == ['--clear']:
+        cache.clear()
+        print(f"✔ キャッシュを空にしました: {cache.path}")
+        sys.exit(0)
+    st = cache.stats()
+    lookups = st['hits'] + st['misses']
+    rate = st['hits'] / lookups * 100 if lookups else 0.0
+    print(f"path    : {cache.path}")
+    print(f"entries : {st['entries']}  ({st['bytes'] / 2**20:.1f} / {st['max_bytes'] / 2**20:.0f} MB)")
+    print(f"hits    : {st['hits']}  misses: {st['misses']}  hit rate: {rate:.1f}%")
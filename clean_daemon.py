@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+clean_daemon.py — 常駐デーモン（Unix ソケット）と薄いクライアント
+────────────────────────────────────────
+● python remove.py --serve で整形エンジンを読み込んだまま待ち受ける
+   └ 正規表現・企業名オートマトン・キャッシュ DB は起動時に 1 度だけ
+● python clean_daemon.py … はデーモンへ依頼するだけの薄いクライアント
+   ├ デーモンがいなければ、その場で remove.py / format_gemini.py と同じ処理
+   └ 結果（出力ファイル・実行ログ・クリップボード・ブラウザ）は直接実行と同じ
+      ※ 実行ログ（runs/）・クリップボードはデーモン側の作業ディレクトリ・環境のもの
+● クライアントは起動を軽くするため json / argparse / socket を読み込まない
+   （それぞれ re・enum などを引き込み、合わせて 20 ms ほど掛かる）
+   └ 受け渡しは長さ 4 バイト＋marshal（ソケットは本人だけ読み書き可）
+● 要求は 1 件ずつ順に処理する（プロファイラなどモジュールの状態を共有するため）
+● 整形コード（clean_engine.py・remove.py・format_gemini.py）や企業辞書の CSV が
+   起動後に変わっていたら、古いまま整形せずに起動し直す
+   ├ 依頼のたびに内容ハッシュと辞書の版（更新時刻）を起動時と比べる
+   ├ その依頼は stale で断り、クライアントがその場で整形する
+   └ デーモンは同じソケットで自分を起動し直す（os.execv）
+● ソケット: $CLEAN_SOCKET、無ければ $XDG_RUNTIME_DIR/note-clean.sock、
+   それも無ければ /tmp/note-clean-<uid>.sock
+
+  python remove.py --serve &                  # make serve
+  python clean_daemon.py                      # input.txt → ./output/（remove.py と同じ）
+  python clean_daemon.py <in> <out> --gemini  # format_gemini.py と同じ
+  python clean_daemon.py - out/ < draft.md    # 原稿を標準入力から
+  python clean_daemon.py --stop
+────────────────────────────────────────
+"""
+
+import os
+import sys
+import marshal
+import _socket                # socket モジュールより軽い（C 実装そのもの）
+
+CONNECT_TIMEOUT = 0.2         # デーモンがいるか確かめる接続の上限（秒）
+
+
+def socket_path() -> str:
+    path = os.environ.get('CLEAN_SOCKET')
+    if path:
+        return path
+    runtime = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime and os.path.isdir(runtime):
+        return os.path.join(runtime, 'note-clean.sock')
+    return f"/tmp/note-clean-{os.getuid()}.sock"
+
+
+def send(sock, obj) -> None:
+    data = marshal.dumps(obj)
+    sock.sendall(len(data).to_bytes(4, 'big') + data)
+
+def _recv_exact(sock, size: int):
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(min(size - len(buf), 1 << 20))
+        if not chunk:
+            return None
+        buf += chunk
+    return bytes(buf)
+
+def receive(sock):
+    """1 件分を受け取る。途中で切断されたら None"""
+    header = _recv_exact(sock, 4)
+    if header is None:
+        return None
+    data = _recv_exact(sock, int.from_bytes(header, 'big'))
+    return None if data is None else marshal.loads(data)
+
+
+# -------------------------------------------------------------
+# クライアント
+# -------------------------------------------------------------
+USAGE = """Usage:
+  python clean_daemon.py [<in> [<out>]] [--gemini] [--copy-background] [--local] [--socket=PATH]
+  python clean_daemon.py --stop [--socket=PATH]
+    <in>    : 原稿（既定 input.txt。- なら標準入力）
+    <out>   : 出力先（既定 remove は output/、--gemini は output.txt）
+    --local : デーモンを使わずこのプロセスで整形"""
+
+def request(message: dict, path: str = None):
+    """デーモンに 1 件依頼して応答を返す。デーモンがいなければ None"""
+    sock = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT)
+    try:
+        sock.connect(path or socket_path())
+    except (FileNotFoundError, ConnectionRefusedError, TimeoutError):
+        sock.close()
+        return None
+    try:
+        sock.settimeout(None)                     # 整形自体は長い原稿だと時間がかかる
+        send(sock, message)
+        resp = receive(sock)
+    finally:
+        sock.close()
+    return resp or {'ok': False, 'error': 'デーモンが応答せずに切断しました'}
+
+
+def client(argv: list) -> int:
+    flags = dict((a.split('=', 1) + [None])[:2] for a in argv if a.startswith('--'))
+    args  = [a for a in argv if not a.startswith('--')]
+    if '--help' in flags or '-h' in args:
+        print(USAGE)
+        return 0
+    if set(flags) - {'--gemini', '--copy-background', '--local', '--socket', '--stop'} \
+            or len(args) > 2:
+        print(USAGE)
+        return 1
+    path = flags.get('--socket')
+
+    if '--stop' in flags:
+        resp = request({'cmd': 'stop'}, path)
+        print("✔ デーモンを止めました" if resp else "デーモンは動いていません")
+        return 0
+
+    gemini  = '--gemini' in flags
+    in_arg  = args[0] if args else 'input.txt'
+    out_arg = args[1] if len(args) > 1 else ('output.txt' if gemini else 'output')
+    message = {'cmd': 'format_gemini' if gemini else 'remove', 'cwd': os.getcwd(),
+               'output': out_arg, 'copy_background': '--copy-background' in flags}
+    if in_arg == '-':
+        message['content'] = sys.stdin.read()
+    else:
+        message['input'] = in_arg
+
+    resp = None if '--local' in flags else request(message, path)
+    if resp is not None and resp.get('stale'):
+        print("⚠ 整形規則か企業辞書が変わったのでデーモンを起動し直します（今回はここで整形）")
+        resp = None
+    if resp is None:                              # デーモンなし：ここで初めて重い import
+        resp = handle(message)
+    sys.stdout.write(resp.get('log', ''))
+    if not resp['ok']:
+        print(f"✖ {resp['error']}")
+        return 1
+    return 0
+
+
+# -------------------------------------------------------------
+# デーモン
+# -------------------------------------------------------------
+def handle(message: dict) -> dict:
+    """要求 1 件 → 応答。log は直接実行したときに表示される内容"""
+    import io
+    import tempfile
+    from contextlib import redirect_stdout
+
+    cmd = message.get('cmd')
+    if cmd == 'ping':
+        return {'ok': True, 'pid': os.getpid()}
+    if cmd not in ('remove', 'format_gemini'):
+        return {'ok': False, 'error': f"未知の要求です: {cmd}"}
+
+    cwd = message.get('cwd') or os.getcwd()
+    tmp = None
+    if 'content' in message:                      # 原稿そのもの → 一時ファイル経由
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', suffix='.txt',
+                                         delete=False) as f:
+            f.write(message['content'])
+        in_path = tmp = f.name
+    else:
+        in_path = os.path.join(cwd, message.get('input', 'input.txt'))
+    out_path = os.path.join(cwd, message['output'])
+
+    log = io.StringIO()
+    try:
+        with redirect_stdout(log):
+            if cmd == 'remove':
+                import remove
+                run_id = remove.main(in_path, remove.resolve_output_dir(out_path),
+                                     bool(message.get('copy_background')))
+            else:
+                import format_gemini
+                run_id = format_gemini.main(in_path, out_path)
+    except Exception as e:
+        return {'ok': False, 'error': f"{type(e).__name__}: {e}", 'log': log.getvalue()}
+    finally:
+        if tmp is not None:
+            os.unlink(tmp)
+    return {'ok': True, 'run_id': run_id, 'log': log.getvalue()}
+
+
+def code_versions() -> tuple:
+    """(整形コードの内容ハッシュ, 企業辞書の版)。CSV は開かず更新時刻だけ見る"""
+    import remove, format_gemini, clean_engine, company_dict
+    from clean_cache import source_version
+    return (source_version(clean_engine.__file__, remove.__file__, format_gemini.__file__),
+            company_dict.current_version())
+
+
+def serve(path: str = None) -> int:
+    """Ctrl+C か stop 要求まで待ち受ける（コードや辞書が変われば起動し直す）"""
+    import socket
+    import remove, format_gemini                  # noqa: F401  先に読み込んで温めておく
+    from clean_engine import company_dict, morph_scanner
+    book = company_dict()                         # 企業辞書も
+    if morph_scanner() is not None:               # 形態素解析の辞書も（COMPANY_MORPH=on）
+        morph_scanner().warm()
+    loaded = (code_versions()[0], book.version)   # 読み込んだ時点の版
+    path = path or socket_path()
+    if os.path.exists(path):
+        if request({'cmd': 'ping'}, path) is not None:
+            print(f"✖ すでに動いています: {path}")
+            return 1
+        os.unlink(path)                           # 前回の残骸
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)                   # 本人だけ読み書き可
+    try:
+        server.bind(path)
+    finally:
+        os.umask(old_umask)
+    server.listen(16)
+    print(f"✔ 待ち受け中: {path}（pid {os.getpid()}・Ctrl+C で終了）")
+    restart = False
+    try:
+        stop = False
+        while not stop:
+            conn, _ = server.accept()
+            with conn:
+                try:
+                    message = receive(conn)
+                except (OSError, ValueError, EOFError, TypeError):
+                    message = None
+                if not isinstance(message, dict):
+                    resp = {'ok': False, 'error': '要求を読み取れません'}
+                elif message.get('cmd') == 'stop':
+                    resp, stop = {'ok': True}, True
+                elif message.get('cmd') != 'ping' and code_versions() != loaded:
+                    resp = {'ok': False, 'stale': True,
+                            'error': '整形規則か企業辞書が変わりました（起動し直します）'}
+                    stop = restart = True
+                else:
+                    resp = handle(message)
+                try:
+                    send(conn, resp)
+                except OSError:                   # クライアントが先に切断した
+                    pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        os.unlink(path)
+    if restart:
+        print("✔ 整形規則か企業辞書が変わったので起動し直します", flush=True)
+        os.execv(sys.executable, [sys.executable, os.path.abspath(remove.__file__),
+                                  '--serve', '--socket', path])
+    print("✔ デーモンを終了しました")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(client(sys.argv[1:]))
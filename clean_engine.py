@@ -0,0 +1,987 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+clean_engine.py — 整形エンジン（remove.py / format_gemini.py / webapp で共有）
+────────────────────────────────────────
+● 整形の各段は「規則」クラスとして 1 度だけ宣言し、段名で登録する
+● 用途ごとのプロファイル（段の並び・企業名の選び方）を名前で選ぶ
+   ├ note   : remove.py・webapp（HTML ペア・見出し内太字も除去）
+   └ gemini : format_gemini.py（文末の「 数字＋句点」も除去）
+● プロファイルは読み込み時に段クラスの列へ解決済み。正規表現も
+   モジュール直下で 1 度だけコンパイルし、全プロファイルで共有
+● ハッシュタグ・免責文もここに一本化（企業辞書は company_dict.py）
+   ├ 企業辞書は最初に企業名を探すときに読む（--help などの起動を軽く）
+   └ COMPANY_MORPH=on で企業名の部分一致を形態素解析で確かめる（company_morph.py）
+● LiveDocument : 段落単位の差分整形（webapp のライブプレビュー用）
+
+  from clean_engine import PROFILES
+  PROFILES['note'].clean_text(raw)
+────────────────────────────────────────
+"""
+
+import os
+import re
+from bisect import bisect_left
+from datetime import datetime
+from typing import Optional
+
+from clean_cache import open_cache, source_version
+from company_matcher import CompanyScan
+from stage_profile import NULL_PROFILER
+
+
+# -------------------------------------------------------------
+# 0  HTML ライクなペアタグ <tag>…</tag> の角括弧だけ除去
+#   HTML_PAIR.sub を変化がなくなるまで繰り返した結果を、タグを
+#   1 回だけ走査して求める。1 周目の sub は「左から順に開きタグを
+#   直後の同名閉じタグと組み、組んだ範囲の内側は次の周へ回す」ので、
+#   未処理の開きタグを周ごとにたどり直し、内側は飛ばして進む。
+#   各開きタグは 1 度しか調べないため、入れ子の深さによらず線形。
+# -------------------------------------------------------------
+HTML_PAIR = re.compile(r"<([A-Za-z][A-Za-z0-9]*)\b[^>]*>(.*?)</\1>", re.DOTALL)
+HTML_TAG  = re.compile(r"</([A-Za-z][A-Za-z0-9]*)>|<([A-Za-z][A-Za-z0-9]*)\b[^>]*>")
+
+def _next_alive(parent: list, i: int) -> int:
+    """削除済みの添字を飛ばした次の添字（経路圧縮つき）"""
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+def match_html_pairs(text: str):
+    """(消すタグの (start, end) 一覧, 相手のいない開きタグ名の一覧) を返す。
+    タグが重なる／除去で新しいタグが生じ得る崩れた入力では None"""
+    if '<<' in text or '</<' in text:
+        return None
+    opens, closes = [], {}
+    for m in HTML_TAG.finditer(text):
+        if m.group(1) is not None:
+            closes.setdefault(m.group(1), []).append(m.span())
+        elif text.find('<', m.start() + 1, m.end()) != -1:
+            return None
+        else:
+            opens.append((m.start(), m.end(), m.group(2)))
+
+    starts = [start for start, _, _ in opens]
+    close_starts = {name: [s for s, _ in spans] for name, spans in closes.items()}
+    free = {name: list(range(len(spans) + 1)) for name, spans in closes.items()}
+    alive = list(range(len(opens) + 1))
+    drop, unmatched = [], []
+    i = _next_alive(alive, 0)
+    while i < len(opens):                          # 1 周 = sub 1 回分
+        while i < len(opens):
+            start, end, name = opens[i]
+            alive[i] = i + 1
+            spans = closes.get(name)
+            if spans:
+                k = _next_alive(free[name], bisect_left(close_starts[name], end))
+                if k < len(spans):
+                    free[name][k] = k + 1
+                    drop += ((start, end), spans[k])
+                    i = _next_alive(alive, bisect_left(starts, spans[k][1]))
+                    continue
+            unmatched.append(name)
+            i = _next_alive(alive, i + 1)
+        i = _next_alive(alive, 0)
+    drop.sort()
+    return drop, unmatched
+
+def _strip_html_pairs_slow(text: str) -> str:
+    prev = None
+    while prev != text:
+        prev = text
+        text = HTML_PAIR.sub(lambda m: m.group(2), text)
+    return text
+
+def strip_html_pairs(text: str) -> str:
+    if '<' not in text:
+        return text
+    found = match_html_pairs(text)
+    if found is None:
+        return _strip_html_pairs_slow(text)
+    return _drop_spans(text, found[0])
+
+def _drop_spans(text: str, spans: list) -> str:
+    pieces, pos = [], 0
+    for start, end in spans:
+        pieces.append(text[pos:start])
+        pos = end
+    pieces.append(text[pos:])
+    return ''.join(pieces)
+
+# -------------------------------------------------------------
+# 1  見出し行内の **bold** を除去
+# -------------------------------------------------------------
+HEADING_BOLD_LINE = re.compile(r"^(?P<prefix>[ \t]*#+\s*)(?P<body>.*)$", re.MULTILINE)
+BOLD_INLINE = re.compile(r'\*\*([^"\n]*?)\*\*')
+
+def strip_bold_in_headings(text: str) -> str:
+    def _repl(match):
+        prefix, body = match.group('prefix'), match.group('body')
+        body_clean = BOLD_INLINE.sub(r"\1", body)
+        return f"{prefix}{body_clean}"
+    return HEADING_BOLD_LINE.sub(_repl, text)
+
+# -------------------------------------------------------------
+# 2  かっこ削除（引用／URL／[] を含むもの）
+#   PAREN_PATTERN / EMPTY_PAREN は直前の空白ごと削除する。先頭が '\s*' の
+#   正規表現は全位置で照合を試みて遅いので、'(' から照合して空白を手で含める
+# -------------------------------------------------------------
+PAREN_PATTERN = re.compile(r"\([^)]*(?:\[[^\]]+]|https?://)[^)]*\)")
+EMPTY_PAREN   = re.compile(r"\(\s*\)")
+LONE_RPAREN   = re.compile(r"\)\s*(?=[。、，…\.\,\)]|\n|$)")
+MULTI_SPACE   = re.compile(r"[ \t]{2,}")
+
+def drop_with_leading_space(pattern: 're.Pattern', text: str) -> str:
+    """re.sub(r"\s*" + pattern, '', text) と同じ結果（空白は前の一致の後ろまで）"""
+    pieces, pos = [], 0
+    for m in pattern.finditer(text):
+        start = m.start()
+        while start > pos and text[start - 1].isspace():   # \s と同じ判定
+            start -= 1
+        pieces.append(text[pos:start])
+        pos = m.end()
+    if not pieces:
+        return text
+    pieces.append(text[pos:])
+    return ''.join(pieces)
+
+def clean_parentheses(text: str) -> str:
+    if '(' in text or ')' in text:
+        text = drop_with_leading_space(PAREN_PATTERN, text)
+        text = drop_with_leading_space(EMPTY_PAREN, text)
+        text = LONE_RPAREN.sub('', text)
+    if '  ' in text or '\t' in text:
+        text = MULTI_SPACE.sub(' ', text)
+    return text
+
+# -------------------------------------------------------------
+# 3 '**   xxx   **' → '**xxx**'
+# -------------------------------------------------------------
+INNER_BOLD = re.compile(r"\*\*[\s\u3000]*([^\*]+?)[\s\u3000]*\*\*")
+
+def strip_inner_spaces(text: str) -> str:
+    return INNER_BOLD.sub(lambda m: f"**{m.group(1)}**", text)
+
+# -------------------------------------------------------------
+# 4 '**xxx**' を前後 1 空白に包む
+# -------------------------------------------------------------
+BOLD_PAIR        = re.compile(r"\*\*([^\*]+?)\*\*")
+SPACES_BEFORE_NL = re.compile(r" *\n")
+SPACES_AFTER_NL  = re.compile(r"\n *")
+
+def pad_bold_uniformly(text: str) -> str:
+    if '**' in text:
+        text = BOLD_PAIR.sub(r" **\1** ", text)
+    if ' \n' in text:
+        text = SPACES_BEFORE_NL.sub('\n', text)
+    if '\n ' in text:
+        text = SPACES_AFTER_NL.sub('\n', text)
+    return text
+
+# -------------------------------------------------------------
+# 5 行途中の '## ' を見出し化
+# -------------------------------------------------------------
+MIDLINE_H2 = re.compile(r"\n(?!\n)(##\s+)")
+
+def ensure_heading_newline(text: str) -> str:
+    return MIDLINE_H2.sub(r"\n\n\1", text)
+
+# -------------------------------------------------------------
+# 6 前書きを削除
+# -------------------------------------------------------------
+PREAMBLE_END = re.compile(r"(?m)^[ \t]*#+\s")
+
+def drop_preamble(text: str) -> str:
+    m = PREAMBLE_END.search(text)
+    return text[m.start():] if m else text
+
+# -------------------------------------------------------------
+# 2a  バックスラッシュ付き '**' を正規 '**' に戻す
+# -------------------------------------------------------------
+def unescape_bold(text: str) -> str:
+    return text.replace(r"\*\*", "**")
+
+# -------------------------------------------------------------
+# 7 文章中の「X月X日時点」を今日に置換
+# -------------------------------------------------------------
+AS_OF_PATTERN = re.compile(r"[0-9０-９]{1,2}月[0-9０-９]{1,2}日時点")
+
+def today_as_of() -> str:
+    today = datetime.now()
+    return f"{today.month}月{today.day}日時点"
+
+def update_as_of_date(text: str) -> str:
+    return AS_OF_PATTERN.sub(today_as_of(), text)
+
+# -------------------------------------------------------------
+# 7a 文末「 数字＋句点」を削除（gemini の出力に付く注番号）
+# -------------------------------------------------------------
+TRAILING_NUM_PATTERN = re.compile(r"\s+[0-9０-９]+(?=[。\.])")
+
+def remove_trailing_numbers(text: str) -> str:
+    """例: '発表しました 8。' → '発表しました。'"""
+    return TRAILING_NUM_PATTERN.sub('', text)
+
+# -------------------------------------------------------------
+# 8 文書モデル：見出し単位のブロック列
+#   原稿を 1 回だけ走査して「行頭 # の行」で区切り、各規則を
+#   ブロックごとに適用して最後に 1 回だけ連結する。
+#   太字・かっこ・HTML ペアは行をまたいで対応づくため、規則ごとに
+#   ブロック末尾で構文が開いたままかを追跡し、開いていれば次の
+#   ブロックと結合してから適用する（全文一括と同じ結果になる）。
+# -------------------------------------------------------------
+BLOCK_START  = re.compile(r"\n(?=#)")
+OPEN_TAG     = re.compile(r"<([A-Za-z][A-Za-z0-9]*)\b")
+CLOSE_TAG    = re.compile(r"</([A-Za-z][A-Za-z0-9]*)>")
+STAR_RUN     = re.compile(r"\*+")
+BARE_HEADING = re.compile(r"[ \t]*#+")
+H2_HEAD      = re.compile(r"##\s+")
+
+# ブロックが細かいほど規則の呼び出しと継ぎ目の確認が増える（見出し数千の
+# 原稿で 2 割ほど遅い）。clean_text・--stream では続く見出しブロックを
+# BLOCK_CHARS 文字まで 1 つにまとめる（規則が開いた構文を結合するのと同じで
+# 結果は変わらない）。段落ごとに差分を取る LiveDocument・節の分割は見出しごと
+BLOCK_CHARS  = 65536
+
+
+class Block:
+    """見出し行から次の見出し直前まで（末尾の改行を含む）"""
+    __slots__ = ('text',)
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+
+def parse_blocks(raw: str, min_chars: int = 0):
+    """前書きを落とし、行頭 '#' の位置でブロックに分割
+    min_chars 文字に満たないうちは次の見出しで区切らない"""
+    m = PREAMBLE_END.search(raw)
+    start = m.start() if m else 0
+    for cut in BLOCK_START.finditer(raw, start):
+        if cut.end() - start >= min_chars:
+            yield Block(raw[start:cut.end()])
+            start = cut.end()
+    yield Block(raw[start:])
+
+
+def iter_blocks(lines, min_chars: int = 0):
+    """parse_blocks のストリーム版（ファイルなど行の反復から読む）
+    見出しが 1 つも無ければ全体が 1 ブロックになるため前書きは溜めておく"""
+    lines = iter(lines)
+    preamble = []
+    for line in lines:
+        if PREAMBLE_END.match(line):
+            break
+        preamble.append(line)
+    else:
+        yield Block(''.join(preamble))
+        return
+    buf, size = [line], len(line)
+    for line in lines:
+        if line[:1] == '#' and size >= min_chars:
+            yield Block(''.join(buf))
+            buf, size = [], 0
+        buf.append(line)
+        size += len(line)
+    yield Block(''.join(buf))
+
+
+def serialize(blocks) -> str:
+    parts = [blk.text for blk in blocks]
+    parts[-1] = parts[-1].rstrip('\n') + '\n'
+    return ''.join(parts)
+
+
+def iter_serialized(blocks):
+    """serialize の逐次版（最後のブロックだけ末尾改行を 1 つに）"""
+    prev = None
+    for blk in blocks:
+        if prev is not None:
+            yield prev
+        prev = blk.text
+    yield prev.rstrip('\n') + '\n'
+
+
+def _ends_with_bare_heading(text: str) -> bool:
+    """末尾が本文なしの見出し（'##' だけの行）か"""
+    tail = text.rstrip()
+    return BARE_HEADING.fullmatch(tail[tail.rfind('\n') + 1:]) is not None
+
+
+STAGES = {}    # 段名 → 規則クラス（@register で登録）
+
+def register(name: str):
+    """規則クラスを段名で登録する。プロファイルはこの名前で段を並べる"""
+    def deco(cls):
+        if name in STAGES:
+            raise ValueError(f"段名が重複しています: {name}")
+        cls.stage_name = name
+        STAGES[name] = cls
+        return cls
+    return deco
+
+
+class Rule:
+    """整形規則 1 つ分。ブロックごとに apply し、構文が開いたまま
+    （scan の状態が真）なら次のブロックと結合して持ち越す"""
+    __slots__ = ()
+    stage_name = ''
+
+    @classmethod
+    def bind(cls, closers: Optional[set], today_str: str) -> 'Rule':
+        """文書 1 つ分の規則オブジェクト。設定を持たない規則は使い回す"""
+        shared = cls.__dict__.get('_shared')
+        if shared is None:
+            shared = cls()
+            setattr(cls, '_shared', shared)
+        return shared
+
+    def apply(self, text: str, tail: str) -> str:
+        return text
+
+    def scan(self, state, text: str):
+        return None
+
+    def finish(self, state, parts: list, nxt: str, tail: str):
+        """区切れるなら適用結果、区切れないなら None"""
+        if state:
+            return None
+        return self.apply(''.join(parts), tail)
+
+    def run(self, blocks):
+        head, parts, state, tail = None, [], None, ''
+        for blk in blocks:
+            if head is not None:
+                out = self.finish(state, parts, blk.text, tail)
+                if out is not None:
+                    head.text, tail = out, out[-1:]
+                    yield head
+                    head, parts, state = None, [], None
+            if head is None:
+                head = blk
+            parts.append(blk.text)
+            state = self.scan(state, blk.text)
+        if head is not None:
+            head.text = self.apply(''.join(parts), tail)
+            yield head
+
+
+class RuleCursor:
+    """Rule.run と同じ手順を 1 ブロックずつ押し込む形にしたもの
+    途中状態（結合中の断片・scan の状態・直前の出力末尾）を控えて戻せる"""
+    __slots__ = ('rule', 'parts', 'state', 'tail')
+
+    def __init__(self, rule: Rule) -> None:
+        self.rule = rule
+        self.parts, self.state, self.tail = [], None, ''
+
+    def feed(self, text: str) -> list:
+        """text を加え、区切れて確定した出力を返す"""
+        out = []
+        if self.parts:
+            res = self.rule.finish(self.state, self.parts, text, self.tail)
+            if res is not None:
+                out.append(res)
+                self.parts, self.state, self.tail = [], None, res[-1:]
+        self.parts.append(text)
+        self.state = self.rule.scan(self.state, text)
+        return out
+
+    def close(self) -> list:
+        if not self.parts:
+            return []
+        out = self.rule.apply(''.join(self.parts), self.tail)
+        self.parts, self.state = [], None
+        return [out]
+
+    def snapshot(self) -> tuple:
+        state = self.state                        # HtmlPairs の状態だけ可変
+        return (tuple(self.parts), state.copy() if isinstance(state, list) else state,
+                self.tail)
+
+    def restore(self, snap: tuple) -> None:
+        parts, state, self.tail = snap
+        self.parts = list(parts)
+        self.state = state.copy() if isinstance(state, list) else state
+
+
+class CursorChain:
+    """全段の RuleCursor を直列につないだもの（Profile.run の押し込み版）"""
+    __slots__ = ('cursors',)
+
+    def __init__(self, rules: list) -> None:
+        self.cursors = [RuleCursor(rule) for rule in rules]
+
+    def feed(self, text: str) -> list:
+        """ブロック 1 つを流し、最後の段まで確定した出力を返す"""
+        texts = [text]
+        for cur in self.cursors:
+            texts = [out for t in texts for out in cur.feed(t)]
+            if not texts:
+                break
+        return texts
+
+    def close(self) -> list:
+        texts = []
+        for cur in self.cursors:
+            texts = [out for t in texts for out in cur.feed(t)] + cur.close()
+        return texts
+
+    def snapshot(self) -> tuple:
+        return tuple(cur.snapshot() for cur in self.cursors)
+
+    def restore(self, snap: tuple) -> None:
+        for cur, part in zip(self.cursors, snap):
+            cur.restore(part)
+
+
+def join_outputs(outputs: list, final: list) -> str:
+    """CursorChain の出力（feed ごとの列と close の分）を serialize と同じ形に連結"""
+    parts = [text for out in outputs for text in out]
+    parts += final[:-1]
+    parts.append(final[-1].rstrip('\n') + '\n')
+    return ''.join(parts)
+
+
+@register('unescape_bold')
+class UnescapeBold(Rule):
+    __slots__ = ()
+
+    def apply(self, text, tail):
+        return unescape_bold(text) if '\\*' in text else text
+
+
+@register('html_pairs')
+class HtmlPairs(Rule):
+    """closers: 文書中に現れる閉じタグ名（None なら不明扱い）"""
+    __slots__ = ('closers',)
+
+    def __init__(self, closers) -> None:
+        self.closers = closers
+
+    @classmethod
+    def bind(cls, closers, today_str):
+        return cls(closers)
+
+    def apply(self, text, tail):
+        return strip_html_pairs(text) if '<' in text else text
+
+    def _relevant(self, names) -> bool:
+        """相手のいない開きタグが後続の閉じタグと組み得るか"""
+        return self.closers is None or not self.closers.isdisjoint(names)
+
+    def _dangling(self, text: str, start: int, end: int) -> bool:
+        names = [m.group(1) for m in OPEN_TAG.finditer(text, start, end)]
+        return bool(names) and self._relevant(names)
+
+    def scan(self, state, text):
+        """状態: [結合中の長さ, 次に区切りを確かめる長さ]
+        相手のいない開きタグが続くと結合が伸びるため、確かめ直しは
+        長さが倍になるごとに間引く（全体で線形）"""
+        if state is None:
+            return [len(text), 0]
+        state[0] += len(text)
+        return state
+
+    def finish(self, state, parts, nxt, tail):
+        if state[0] < state[1]:
+            return None
+        out = self._cut(''.join(parts))
+        if out is None:
+            state[1] = 2 * state[0]
+        return out
+
+    def _cut(self, text: str):
+        """区切れるなら適用結果、区切れないなら None"""
+        if '<' not in text:
+            return text
+        found = match_html_pairs(text)
+        if found is not None:
+            drop, unmatched = found
+            if (unmatched and self._relevant(unmatched)) or \
+                    self._dangling(text, text.rfind('>') + 1, len(text)):
+                return None                       # '>' が次ブロックにある開きタグも
+            return _drop_spans(text, drop)
+        while True:                               # 崩れた入力は従来の反復で確認
+            pieces, pos = [], 0
+            for m in HTML_PAIR.finditer(text):
+                if self._dangling(text, pos, m.start()):
+                    return None
+                pieces += (text[pos:m.start()], m.group(2))
+                pos = m.end()
+            if self._dangling(text, pos, len(text)):
+                return None
+            if not pieces:
+                return text
+            pieces.append(text[pos:])
+            text = ''.join(pieces)
+
+
+@register('heading_bold')
+class HeadingBold(Rule):
+    __slots__ = ()
+
+    def apply(self, text, tail):
+        return strip_bold_in_headings(text) if '**' in text else text
+
+    def finish(self, state, parts, nxt, tail):
+        if _ends_with_bare_heading(parts[-1]):
+            return None
+        return self.apply(''.join(parts), tail)
+
+
+@register('as_of_date')
+class AsOfDate(Rule):
+    __slots__ = ('today_str',)
+
+    def __init__(self, today_str: str) -> None:
+        self.today_str = today_str
+
+    @classmethod
+    def bind(cls, closers, today_str):
+        return cls(today_str)
+
+    def apply(self, text, tail):
+        return AS_OF_PATTERN.sub(self.today_str, text) if '時点' in text else text
+
+
+@register('parentheses')
+class Parentheses(Rule):
+    """状態: (累積長, 最後の '(' ')' '[' ']' の位置)"""
+    __slots__ = ()
+
+    def apply(self, text, tail):
+        return clean_parentheses(text)
+
+    def scan(self, state, text):
+        base, *last = state or (0, -1, -1, -1, -1)
+        for i, ch in enumerate('()[]'):
+            pos = text.rfind(ch)
+            if pos != -1:
+                last[i] = base + pos
+        return (base + len(text), *last)
+
+    def finish(self, state, parts, nxt, tail):
+        _, lp, rp, lb, rb = state
+        if lp != -1 and (lp > rp or lb > rp or rb > rp or lb > rb):
+            return None                           # '(' が次ブロックまで開く
+        if parts[-1].rstrip().endswith(')'):
+            return None                           # 末尾 ')' の削除範囲が変わる
+        return self.apply(''.join(parts), tail)
+
+
+@register('bold_pairs')
+class BoldPairs(Rule):
+    """内側空白の除去と前後 1 空白化（同じ '**' の組み合わせを使う 2 段）
+    状態: 末尾の '**' が相手を探している途中か"""
+    __slots__ = ()
+
+    def apply(self, text, tail):
+        return pad_bold_uniformly(strip_inner_spaces(text))
+
+    def scan(self, state, text):
+        if '*' not in text:
+            return state
+        pairs = text.count('**')
+        if '***' not in text and text.count('*') == 2 * pairs:
+            return bool(state) != bool(pairs & 1)   # すべて '**' 単独
+        opener = bool(state)
+        for run in STAR_RUN.findall(text):
+            n = len(run)
+            closer = opener and n >= 2
+            opener = n >= 2 and (not closer or n >= 4)
+        return opener
+
+
+@register('heading_newline')
+class HeadingNewline(Rule):
+    __slots__ = ()
+
+    def apply(self, text, tail):
+        out = ensure_heading_newline(text)
+        if tail == '\n' and H2_HEAD.match(text):
+            out = '\n' + out                      # 直前ブロック末尾の改行と組む
+        return out
+
+    def finish(self, state, parts, nxt, tail):
+        m = H2_HEAD.match(nxt)
+        if _ends_with_bare_heading(parts[-1]) or (m and '\n' in m.group()):
+            return None
+        return self.apply(''.join(parts), tail)
+
+
+@register('trailing_numbers')
+class TrailingNumbers(Rule):
+    """空白・数字・句点は見出しをまたがないのでブロックごとに適用できる"""
+    __slots__ = ()
+
+    def apply(self, text, tail):
+        return remove_trailing_numbers(text)
+
+
+def html_closers(chunks) -> Optional[set]:
+    """文書中の閉じタグ名。タグ除去で閉じタグが生じ得るなら None
+    （chunks は全文 1 つ、または行単位など '<<' や閉じタグを切らない分割）"""
+    closers = set()
+    for chunk in chunks:
+        if '<' not in chunk:
+            continue
+        tags = CLOSE_TAG.findall(chunk) if '</' in chunk else []
+        if '<<' in chunk or chunk.count('</') != len(tags):
+            return None
+        closers.update(tags)
+    return closers
+
+
+
+# -------------------------------------------------------------
+# 9 企業名・タグ・免責文（全プロファイル共通）
+#   照合は表記（別名を含む）のまま行い、選んだ表記を pick_company で
+#   正式名へ寄せる。ハッシュタグは正式名から辞書 1 回でコード・業種まで
+#   COMPANY_MORPH=on なら部分一致を形態素解析で確かめる（company_morph.py）
+#   辞書は company_dict() が初回に読む（起動時には読まない）
+# -------------------------------------------------------------
+
+DISCLAIMER = (
+    "※本記事は銘柄に関する情報をもとに分析を行ったものであり、"
+    "特定の投資行動を推奨するものではありません。"
+    "投資に関する最終的な判断は、ご自身の責任にてお願いいたします。"
+)
+
+HASH_TAGS = (
+    "#株式投資 #株 #株価 #業績 #投資 #銘柄分析 #資産運用 #新NISA #NISA #経済 #企業"
+)
+
+_COMPANY_DICT   = None         # company_dict() が初回に読む
+_COMPANY_MORPH  = False        # 未確認。morph_scanner() が初回に決める
+
+def company_dict():
+    """企業辞書（company_dict.py。CSV＋別名表から構築済みの表を読む）"""
+    global _COMPANY_DICT
+    if _COMPANY_DICT is None:
+        from company_dict import load
+        _COMPANY_DICT = load()
+    return _COMPANY_DICT
+
+def company_matcher():
+    return company_dict().matcher
+
+def morph_scanner():
+    """COMPANY_MORPH=on のときだけ company_morph（と janome）を読み込んで作る
+    無効・janome が無ければ None。無効なら起動時に何も読み込まない"""
+    global _COMPANY_MORPH
+    if _COMPANY_MORPH is False:
+        scanner = None
+        if os.environ.get('COMPANY_MORPH', '').lower() in ('1', 'on', 'yes'):
+            from company_morph import open_scanner
+            scanner = open_scanner(company_matcher())
+        _COMPANY_MORPH = scanner
+    return _COMPANY_MORPH
+
+def scan_companies(text: str) -> CompanyScan:
+    """企業名の走査。COMPANY_MORPH=on なら形態素の境目が合う一致だけ"""
+    morph = morph_scanner()
+    if morph is not None:
+        return morph.scan(text)
+    return company_matcher().scan(text)
+
+def build_hashtags(company: str) -> str:
+    """共通タグ＋企業名・証券コード・業種のタグ（辞書に無い名前は名前だけ）"""
+    info = company_dict().lookup(company)
+    if info is not None:
+        return HASH_TAGS + " " + " ".join(info.tags())
+    return HASH_TAGS + (f" #{company}" if company != "その他" else "")
+
+# -------------------------------------------------------------
+# 10 プロファイル（段の並び＋企業名の選び方）
+#   段名の列は定義時に規則クラスの列へ解決しておき、文書ごとには
+#   bind で規則を並べてブロック列に通すだけ。CLI・ストリーム・webapp・
+#   ベンチはすべてこの経路を使う。
+#   PROFILER は --profile のときだけ set_profiler で StageProfiler に
+#   差し替える。結果キャッシュの版はこのファイルのハッシュなので、
+#   段やプロファイルを変えれば自動で無効化される。
+# -------------------------------------------------------------
+PROFILER         = NULL_PROFILER
+CLEAN_CACHE      = open_cache()
+PIPELINE_VERSION = source_version(__file__)
+
+def set_profiler(profiler) -> None:
+    global PROFILER
+    PROFILER = profiler
+
+
+class Profile:
+    """stages: 段名の列 / pick: 企業名の選び方
+    （'first' = 最も前に出る企業名、'longest' = 最長の企業名）"""
+    __slots__ = ('name', 'stages', 'pick', 'uses_html')
+
+    def __init__(self, name: str, stages: tuple, pick: str = 'first') -> None:
+        unknown = [s for s in stages if s not in STAGES]
+        if unknown:
+            raise ValueError(f"未登録の段です: {', '.join(unknown)}")
+        if pick not in ('first', 'longest'):
+            raise ValueError(f"pick は first / longest のどちらかです: {pick}")
+        self.name      = name
+        self.stages    = tuple(STAGES[s] for s in stages)
+        self.pick      = pick
+        self.uses_html = HtmlPairs in self.stages
+
+    def __repr__(self) -> str:
+        return f"Profile({self.name!r}, {[cls.stage_name for cls in self.stages]})"
+
+    def closers(self, chunks) -> Optional[set]:
+        """HtmlPairs を含むときだけ閉じタグ名を集める（含まなければ読まない）"""
+        return html_closers(chunks) if self.uses_html else None
+
+    def rules(self, closers: Optional[set] = None, today_str: Optional[str] = None) -> list:
+        today_str = today_str or today_as_of()
+        return [cls.bind(closers, today_str) for cls in self.stages]
+
+    def run(self, blocks, closers: Optional[set] = None):
+        """ブロック列（反復可能）に全段を通す。結果も遅延評価のまま"""
+        for rule in self.rules(closers):
+            blocks = rule.run(blocks)
+        return blocks
+
+    def clean_text(self, raw: str) -> str:
+        if PROFILER.enabled:
+            return self._clean_text_profiled(raw)
+        return serialize(self.run(parse_blocks(raw, BLOCK_CHARS), self.closers((raw,))))
+
+    def _clean_text_profiled(self, raw: str) -> str:
+        """--profile 用。段ごとにブロック列を確定させて計測する（結果は同じ）"""
+        with PROFILER.stage('parse_blocks', raw) as st:
+            blocks = list(parse_blocks(raw, BLOCK_CHARS))
+            st.output(blocks)
+        with PROFILER.stage('bind rules', raw):
+            rules = self.rules(self.closers((raw,)))
+        for rule in rules:
+            with PROFILER.stage(rule.stage_name, blocks) as st:
+                blocks = list(rule.run(blocks))
+                st.output(blocks)
+        with PROFILER.stage('serialize', blocks) as st:
+            text = serialize(blocks)
+            st.output(text)
+        return text
+
+    def clean_text_sections(self, raw: str, workers: int) -> str:
+        """節に分けて最大 workers プロセスで整形（結果は clean_text と同じ）
+        1 節にしかならない短い原稿は clean_text と同じく逐次で"""
+        texts = [blk.text for blk in parse_blocks(raw)]
+        sections = split_sections(texts, workers)
+        if len(sections) < 2:
+            return self.clean_text(raw)
+        from concurrent.futures import ProcessPoolExecutor    # 使うときだけ
+
+        closers, today_str = self.closers((raw,)), today_as_of()
+        chain = CursorChain(self.rules(closers, today_str))
+        with ProcessPoolExecutor(max_workers=len(sections) - 1) as pool:
+            futures = [pool.submit(_clean_section, self.name, closers, today_str, section)
+                       for section in sections[1:]]
+            outputs = [chain.feed(text) for text in sections[0]]    # 1 節目はこのプロセスで
+            for section, fut in zip(sections[1:], futures):
+                outs, heads, end = fut.result()
+                for j, text in enumerate(section):
+                    if j < len(heads) and chain.snapshot() == heads[j]:
+                        outputs += outs[j:]               # 以降はワーカーの結果と同じ
+                        chain.restore(end)
+                        break
+                    outputs.append(chain.feed(text))
+        return join_outputs(outputs, chain.close())
+
+    def clean_text_cached(self, raw: str, sections: int = 0) -> str:
+        """sections > 1 なら長い原稿を節ごとに並列整形（キャッシュは共通）"""
+        if PROFILER.enabled:                          # 計測時は毎回実際に（逐次で）整形
+            return self.clean_text(raw)
+        if sections > 1:
+            clean = lambda text: self.clean_text_sections(text, sections)
+        else:
+            clean = self.clean_text
+        if CLEAN_CACHE is None:
+            return clean(raw)
+        return CLEAN_CACHE.cached(clean, raw, self.name, PIPELINE_VERSION, today_as_of())
+
+    def detect_company(self, text: str) -> str:
+        return self.pick_company(scan_companies(text))
+
+    def pick_company(self, scan: CompanyScan) -> str:
+        """走査結果から 1 社を選び正式名で返す（別名で見つかっても正式名）"""
+        name = scan.first() if self.pick == 'first' else scan.longest()
+        return company_dict().canonical(name) or 'その他'
+
+
+PROFILES = {profile.name: profile for profile in (
+    Profile('note', ('unescape_bold', 'html_pairs', 'heading_bold', 'as_of_date',
+                     'parentheses', 'bold_pairs', 'heading_newline')),
+    Profile('gemini', ('as_of_date', 'parentheses', 'bold_pairs', 'heading_newline',
+                       'trailing_numbers'), pick='longest'),
+)}
+
+def get_profile(name: str) -> Profile:
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"未知のプロファイルです: {name}（{' / '.join(PROFILES)}）") from None
+
+
+# -------------------------------------------------------------
+# 11 差分整形（webapp のライブプレビュー）
+#   原稿は行頭 '#' の直前で段落に分け、段落 ID（クライアントが付ける
+#   内容ハッシュ）の列として受け取る。ブロック i を流す直前の全規則の
+#   途中状態を控えておき、更新時は最初に変わったブロックから流し直す。
+#   変更範囲を過ぎて途中状態が前回と一致したら、残りは前回の出力を
+#   そのまま使う。見出し改行や太字の持ち越しなど段落をまたぐ効果は
+#   途中状態に含まれるので、結果は clean_text と同じ。
+# -------------------------------------------------------------
+def split_paragraphs(raw: str) -> list:
+    """行頭 '#' の直前で区切った段落の列（webapp の main.js と同じ区切り）"""
+    cuts = [m.end() for m in BLOCK_START.finditer(raw)]
+    return [raw[i:j] for i, j in zip([0] + cuts, cuts + [len(raw)])]
+
+
+class LiveDocument:
+    """1 セッション分の原稿と整形の途中経過
+    update の手間は文書の長さではなく、変わった段落（と結合で巻き込む
+    前後の段落）の長さで決まる"""
+    __slots__ = ('profile', 'texts', 'info', 'keys', 'bound', 'chain',
+                 'checkpoints', 'outputs', 'final', 'fed')
+
+    def __init__(self, profile: Profile) -> None:
+        self.profile     = profile
+        self.texts       = {}     # 段落 ID → 原文（今の原稿の分だけ）
+        self.info        = {}     # 段落 ID → (閉じタグ名, 企業名の走査, 前書き終端)
+        self.keys        = []     # ブロックの鍵 (段落 ID, 開始位置)
+        self.bound       = None   # (閉じタグ名, 置換日付)。変われば全部流し直す
+        self.chain       = None
+        self.checkpoints = []     # ブロック i の直前の全規則の状態（末尾は close 直前）
+        self.outputs     = []     # ブロック i を流したときに確定した出力
+        self.final       = []     # close で確定した出力
+        self.fed         = 0      # 直前の update で流したブロック数
+
+    def missing(self, ids: list, sent: dict) -> list:
+        """原文が手元にも送信分にも無い段落 ID"""
+        return [i for i in dict.fromkeys(ids) if i not in sent and i not in self.texts]
+
+    def _paragraph(self, pid: str, text: str) -> tuple:
+        found = self.info.get(pid)
+        if found is None:
+            closers = html_closers((text,)) if self.profile.uses_html else None
+            m = PREAMBLE_END.search(text)
+            found = (closers, scan_companies(text).reduced(), m.start() if m else -1)
+        return found
+
+    def update(self, ids: list, sent: dict) -> tuple:
+        """ids: 段落 ID の列（文書順） / sent: 今回送られた {ID: 原文}
+        → (整形結果, 企業名)。原文の無い ID があれば KeyError"""
+        if any(self.texts.get(pid, text) != text for pid, text in sent.items()):
+            self.info, self.bound = {}, None      # 同じ ID で中身が違う：全部流し直す
+        texts = {pid: sent[pid] if pid in sent else self.texts[pid] for pid in ids}
+        info = {pid: self._paragraph(pid, text) for pid, text in texts.items()}
+        self.texts, self.info = texts, info
+        infos = [info[pid] for pid in ids]
+
+        closers = None
+        if self.profile.uses_html:
+            closers = set()
+            for tags, _, _ in infos:
+                if tags is None:
+                    closers = None
+                    break
+                closers |= tags
+
+        # parse_blocks と同じ区切り：前書きを落とし、段落はそのままブロック
+        keys = [(pid, 0) for pid in ids] or [('', 0)]
+        for n, (_, _, start) in enumerate(infos):
+            if start != -1:
+                keys = [(ids[n], start)] + keys[n + 1:]
+                break
+
+        bound = (None if closers is None else frozenset(closers), today_as_of())
+        if bound != self.bound:
+            self.chain = CursorChain(self.profile.rules(closers))
+            self.bound, self.keys = bound, []
+            self.checkpoints = [self.chain.snapshot()]
+        self._refeed(keys)
+        company = self.profile.pick_company(
+            CompanyScan.concat(scan for _, scan, _ in infos if scan.matches))
+        return join_outputs(self.outputs, self.final), company
+
+    def update_text(self, raw: str) -> tuple:
+        """原稿全体から update（段落の原文そのものを ID にする）"""
+        paragraphs = split_paragraphs(raw)
+        return self.update(paragraphs, {p: p for p in paragraphs if p not in self.texts})
+
+    def _refeed(self, keys: list) -> None:
+        old_keys, old_ck, old_out = self.keys, self.checkpoints, self.outputs
+        n, m = len(keys), len(old_keys)
+        k = 0
+        while k < min(n, m) and keys[k] == old_keys[k]:
+            k += 1
+        s = 0
+        while s < min(n, m) - k and keys[n - 1 - s] == old_keys[m - 1 - s]:
+            s += 1
+
+        chain = self.chain
+        chain.restore(old_ck[k])
+        checkpoints, outputs = old_ck[:k], old_out[:k]
+        self.fed = 0
+        for i in range(k, n + 1):
+            snap = chain.snapshot()
+            if i >= n - s:
+                j = i - n + m                     # 変わっていない後半の対応位置
+                if snap == old_ck[j]:
+                    checkpoints += old_ck[j:]
+                    outputs += old_out[j:]
+                    break
+            checkpoints.append(snap)
+            if i == n:
+                self.final = chain.close()
+                break
+            pid, start = keys[i]
+            text = self.texts[pid][start:] if pid else ''
+            outputs.append(chain.feed(text))
+            self.fed += 1
+        self.keys, self.checkpoints, self.outputs = keys, checkpoints, outputs
+
+
+# -------------------------------------------------------------
+# 12 節ごとの並列整形（長い原稿を CPU コアに分ける）
+#   ブロック列を '## ' 見出しの位置でほぼ同じ大きさの節に分け、2 節目
+#   以降をプロセスプールで空の状態から流す（1 節目は呼び出し側で）。
+#   つなぎ目では実際の途中状態のまま次の節の先頭を流し直し、ワーカーが
+#   控えた途中状態と一致したところで残りをワーカーの出力に切り替える。
+#   前書きの削除は分割前、末尾改行の整理は連結後に 1 回だけ行う。
+#   見出し改行や太字・かっこの持ち越しは途中状態に含まれるので、
+#   結果は逐次と同じ（一致しなければその節は逐次で流すだけ）。
+# -------------------------------------------------------------
+SECTION_MIN   = 256 * 2**10   # 1 節の最小文字数（これより短い原稿は分けない）
+SECTION_PROBE = 8             # つなぎ目で途中状態を突き合わせるブロック数
+
+def split_sections(texts: list, count: int) -> list:
+    """ブロックの列を count 個以下の節に分ける。区切りは '## ' で始まるブロックの直前"""
+    total = sum(map(len, texts))
+    count = min(count, total // SECTION_MIN)
+    if count < 2:
+        return [texts]
+    target = total / count
+    sections, start, size = [], 0, 0
+    for i, text in enumerate(texts):
+        if size >= target and len(sections) < count - 1 and H2_HEAD.match(text):
+            sections.append(texts[start:i])
+            start, size = i, 0
+        size += len(text)
+    sections.append(texts[start:])
+    return sections
+
+
+def _clean_section(name: str, closers: Optional[set], today_str: str, texts: list) -> tuple:
+    """ワーカー側：節を空の状態から流す
+    → (ブロックごとの出力, 先頭 SECTION_PROBE 個の直前の途中状態, 末尾の途中状態)"""
+    chain = CursorChain(PROFILES[name].rules(closers, today_str))
+    outputs, heads = [], []
+    for i, text in enumerate(texts):
+        if i < SECTION_PROBE:
+            heads.append(chain.snapshot())
+        outputs.append(chain.feed(text))
+    return outputs, heads, chain.snapshot()
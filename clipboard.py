@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+clipboard.py — クリップボードへの順次コピー（固定 sleep の置き換え）
+────────────────────────────────────────
+● 1 件 copy するごとに paste() を短い間隔（倍々で延ばす）で読み返し、
+   中身が届いたのを確かめてから次へ進む
+   └ 届くまでの時間は環境・クリップボード管理ツールで違うので、
+      固定の待ち時間（旧 0.5 秒 × 3）より速く、かつ取りこぼさない
+● バックエンドは差し替え可能
+   ├ PyperclipClipboard : 実際のクリップボード（pyperclip）
+   └ MemoryClipboard    : メモリ上の偽物（反映の遅れも再現。画面なしで計時できる）
+● CopyJob は別スレッドで実行し、呼び出し側はすぐ戻る
+● 環境変数 CLIPBOARD=memory で偽物、CLIPBOARD=off でコピーしない
+   CLIPBOARD_HOLD=<秒> で確認後も各項目をその秒数だけ残す
+   （一定間隔で履歴を取りに来る管理ツール向け。既定 0）
+
+  python clipboard.py [--latency 0.05]    # 偽物で 3 件分の所要時間を表示
+────────────────────────────────────────
+"""
+
+import os
+import sys
+import time
+import threading
+from typing import Optional
+
+POLL_FIRST   = 0.005          # 読み返しの初回間隔（秒）
+POLL_MAX     = 0.1            # 間隔の上限（倍々で延ばす）
+CONFIRM_WAIT = 2.0            # 届いたと確認できるまで待つ上限（秒）
+
+
+class ClipboardTimeout(Exception):
+    """copy した内容が時間内に paste() で読み返せなかった"""
+
+
+class PyperclipClipboard:
+    __slots__ = ('_pyperclip',)
+
+    def __init__(self) -> None:
+        import pyperclip          # 使うときだけ読み込む（起動を軽く）
+        self._pyperclip = pyperclip
+
+    def copy(self, text: str) -> None:
+        self._pyperclip.copy(text)
+
+    def paste(self) -> str:
+        return self._pyperclip.paste()
+
+
+class MemoryClipboard:
+    """copy から latency 秒たつと paste() に現れる偽のクリップボード
+    history: copy の (時刻, 内容) 一覧"""
+    __slots__ = ('latency', 'history', '_lock')
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.history = []
+        self._lock = threading.Lock()
+
+    def copy(self, text: str) -> None:
+        with self._lock:
+            self.history.append((time.monotonic(), text))
+
+    def paste(self) -> str:
+        now = time.monotonic()
+        with self._lock:
+            for at, text in reversed(self.history):
+                if now - at >= self.latency:
+                    return text
+        return ''
+
+
+def _same(pasted: str, text: str) -> bool:
+    """改行コードの違い（Windows で \\r\\n になる）は同じとみなす"""
+    return pasted == text or pasted.replace('\r\n', '\n') == text.replace('\r\n', '\n')
+
+
+def copy_confirmed(backend, text: str, timeout: float = CONFIRM_WAIT) -> float:
+    """copy して paste() で届いたのを確かめる。所要秒を返す"""
+    start = time.monotonic()
+    backend.copy(text)
+    delay = POLL_FIRST
+    while not _same(backend.paste(), text):
+        elapsed = time.monotonic() - start
+        if elapsed >= timeout:
+            raise ClipboardTimeout(f"{timeout:.1f} 秒以内にクリップボードへ反映されませんでした")
+        time.sleep(min(delay, timeout - elapsed))
+        delay = min(delay * 2, POLL_MAX)
+    return time.monotonic() - start
+
+
+def copy_sequence(backend, items: list, hold: float = 0.0,
+                  timeout: float = CONFIRM_WAIT) -> list:
+    """items を順にコピー（各項目は届いてから hold 秒残す）。各項目の所要秒を返す"""
+    seconds = []
+    for item in items:
+        start = time.monotonic()
+        copy_confirmed(backend, item, timeout)
+        if hold:
+            time.sleep(hold)
+        seconds.append(time.monotonic() - start)
+    return seconds
+
+
+class CopyJob:
+    """別スレッドで copy_sequence を実行する（非デーモンなので
+    プロセスはコピーが終わるまで終了しない）"""
+    __slots__ = ('seconds', 'error', '_thread', '_on_done')
+
+    def __init__(self, backend, items: list, hold: float = 0.0,
+                 timeout: float = CONFIRM_WAIT, on_done=None) -> None:
+        self.seconds, self.error = None, None
+        self._on_done = on_done
+        self._thread = threading.Thread(target=self._run, name='clipboard',
+                                        args=(backend, list(items), hold, timeout))
+        self._thread.start()
+
+    def _run(self, backend, items, hold, timeout) -> None:
+        try:
+            self.seconds = copy_sequence(backend, items, hold, timeout)
+        except Exception as e:            # スレッド外へは投げずに持ち帰る
+            self.error = e
+        if self._on_done is not None:
+            self._on_done(self)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """終わったら True"""
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+
+def open_clipboard():
+    """環境変数 CLIPBOARD に従ってバックエンドを開く（off なら None）"""
+    kind = os.environ.get('CLIPBOARD', 'pyperclip').lower()
+    if kind in ('', '0', 'off', 'no'):
+        return None
+    if kind == 'memory':
+        return MemoryClipboard()
+    return PyperclipClipboard()
+
+
+def hold_seconds() -> float:
+    return float(os.environ.get('CLIPBOARD_HOLD', '0') or 0)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="偽のクリップボードで順次コピーを計時")
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help="copy から paste() に現れるまでの遅れ（秒）")
+    parser.add_argument('--hold', type=float, default=0.0)
+    args = parser.parse_args()
+
+    board = MemoryClipboard(args.latency)
+    items = ['タイトル', '#株式投資 #株', '本文\n' * 1000]
+    start = time.perf_counter()
+    job = CopyJob(board, items, args.hold)
+    returned = time.perf_counter() - start
+    job.wait()
+    if job.error:
+        print(f"✖ {job.error}")
+        sys.exit(1)
+    for item, sec in zip(items, job.seconds):
+        print(f"{sec * 1000:8.1f} ms  {item[:20]!r}")
+    print(f"✔ 呼び出しから戻るまで {returned * 1000:.1f} ms / 全体 "
+          f"{(time.perf_counter() - start) * 1000:.1f} ms（旧方式 {len(items) * 500} ms）")
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+company_dict.py — 企業辞書（CSV＋別名表 → 照合オートマトン・正式名・証券コード・業種）
+────────────────────────────────────────
+● company_schedule_100days.csv（Code / Company / Sector）が正式名の一覧
+● company_aliases.csv（Alias / Company）で略称・旧称を正式名に寄せる
+   └ 例: NTT → 日本電信電話、三菱UFJ → 三菱UFJFG
+● 照合は正式名・別名をまとめた CompanyMatcher。見つかった表記から
+   辞書 1 回で正式名・コード・業種が引ける
+● 構築結果は .cache/companies.marshal に保存し、起動時は読むだけ
+   ├ 版 = 入力 CSV 2 つと構築コード（このファイル・company_matcher.py）の
+   │      更新時刻・サイズ＋Python の版。どれかが変われば次の読み込みで作り直す
+   │      （中身は読まない。stat 4 回で済むので読み込みのたびに確かめられる）
+   └ 保存できない環境（読み取り専用など）では毎回メモリ上で構築
+
+  python company_dict.py            # 作り直して一覧を表示
+  python company_dict.py トヨタ      # 照合の確認
+────────────────────────────────────────
+"""
+
+import os
+import sys
+import marshal
+from typing import Optional
+
+from company_matcher import CompanyMatcher
+
+ROOT         = os.path.dirname(os.path.abspath(__file__))
+CSV_FILE     = os.path.join(ROOT, 'company_schedule_100days.csv')
+ALIAS_FILE   = os.path.join(ROOT, 'company_aliases.csv')
+DEFAULT_PATH = os.path.join(ROOT, '.cache', 'companies.marshal')
+BUILD_FILES  = (CSV_FILE, ALIAS_FILE, __file__,
+                os.path.join(ROOT, 'company_matcher.py'))
+
+
+class Company:
+    __slots__ = ('name', 'code', 'sector')
+
+    def __init__(self, name: str, code: str, sector: str) -> None:
+        self.name, self.code, self.sector = name, code, sector
+
+    def __repr__(self) -> str:
+        return f"Company({self.name!r}, {self.code!r}, {self.sector!r})"
+
+    def tags(self) -> list:
+        """正式名・証券コード・業種（「商社・重工」などは分けて）のハッシュタグ"""
+        sectors = self.sector.replace('／', '・').split('・')
+        return [f"#{self.name}", f"#{self.code}"] + [f"#{s}" for s in sectors if s]
+
+
+class CompanyDict:
+    """matcher : 正式名と別名の照合器（表記をそのまま返す）
+    lookup(表記) : 正式名の Company（未登録なら None）"""
+    __slots__ = ('matcher', 'companies', '_by_name', 'version')
+
+    def __init__(self, matcher: CompanyMatcher, companies: list,
+                 canon: dict, version: str) -> None:
+        self.matcher   = matcher
+        self.companies = companies
+        self._by_name  = {name: companies[i] for name, i in canon.items()}
+        self.version   = version
+
+    def lookup(self, name: Optional[str]) -> Optional[Company]:
+        return self._by_name.get(name)
+
+    def canonical(self, name: Optional[str]) -> Optional[str]:
+        """表記 → 正式名（未登録の表記はそのまま）"""
+        company = self._by_name.get(name)
+        return company.name if company is not None else name
+
+
+# -------------------------------------------------------------
+# 構築（CSV → marshal できる組み込み型の表）
+# -------------------------------------------------------------
+def _read_csv(path: str) -> list:
+    import csv                                    # 作り直すときだけ
+    with open(path, encoding='utf-8-sig', newline='') as f:   # Excel 保存の BOM も可
+        return list(csv.DictReader(f))
+
+def build_state(version: str) -> dict:
+    """{version, companies: [(正式名, コード, 業種)], canon: {表記: 添字}, matcher}
+    照合の優先順（longest の同長比較）は CSV の順で、正式名の直後にその別名"""
+    companies, canon = [], {}
+    for row in _read_csv(CSV_FILE):
+        name = row['Company'].strip()
+        if name in canon:
+            raise ValueError(f"{CSV_FILE}: 企業名が重複しています: {name}")
+        canon[name] = len(companies)
+        companies.append((name, row['Code'].strip(), row['Sector'].strip()))
+    aliases = {}
+    for row in _read_csv(ALIAS_FILE):
+        alias, name = row['Alias'].strip(), row['Company'].strip()
+        if name not in canon:
+            raise ValueError(f"{ALIAS_FILE}: 正式名が CSV にありません: {name}")
+        if alias in canon or alias in aliases:
+            raise ValueError(f"{ALIAS_FILE}: 別名が重複しています: {alias}")
+        aliases[alias] = name
+    patterns = []
+    for name, _, _ in companies:
+        patterns.append(name)
+        patterns += [alias for alias, target in aliases.items() if target == name]
+    for alias, name in aliases.items():
+        canon[alias] = canon[name]
+    return {'version': version, 'companies': companies, 'canon': canon,
+            'matcher': CompanyMatcher(patterns).state()}
+
+
+def from_state(state: dict) -> CompanyDict:
+    return CompanyDict(CompanyMatcher.from_state(state['matcher']),
+                       [Company(*row) for row in state['companies']],
+                       state['canon'], state['version'])
+
+
+def current_version() -> str:
+    """入力と構築コードの更新時刻・サイズから作る版（ハッシュは取らない）"""
+    stamps = []
+    for path in BUILD_FILES:
+        st = os.stat(path)
+        stamps.append(f"{st.st_mtime_ns:x}.{st.st_size:x}")
+    return f"{'-'.join(stamps)}-py{sys.version_info[0]}.{sys.version_info[1]}"
+
+
+def load(path: str = DEFAULT_PATH) -> CompanyDict:
+    """保存済みの表を読む。無い・古い・壊れているときは作り直して保存"""
+    version = current_version()
+    try:
+        with open(path, 'rb') as f:
+            state = marshal.loads(f.read())       # marshal.load(f) は細切れに読むので遅い
+        if isinstance(state, dict) and state.get('version') == version:
+            return from_state(state)
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    state = build_state(version)
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(marshal.dumps(state))
+        os.replace(tmp, path)                     # 並行して読み込む他のプロセスも壊れない
+    except OSError:
+        pass                                      # 保存できなくても使える
+    return from_state(state)
+
+
+# -------------------------------------------------------------
+# スクリプト直接実行
+# -------------------------------------------------------------
+if __name__ == '__main__':
+    try:
+        os.unlink(DEFAULT_PATH)
+    except FileNotFoundError:
+        pass
+    book = load()
+    if len(sys.argv) > 1:
+        scan = book.matcher.scan(' '.join(sys.argv[1:]))
+        for pos, name in scan.matches:
+            print(f"{pos:>5}  {name}  → {book.lookup(name)}")
+        sys.exit(0)
+    for company in book.companies:
+        aliases = [n for n, c in book._by_name.items() if c is company and n != company.name]
+        print(f"{company.code}  {company.name:<20} {company.sector}"
+              + (f"  （別名: {'、'.join(aliases)}）" if aliases else ''))
+    print(f"✔ {len(book.companies)} 社・表記 {len(book.matcher.names)} 件 → {DEFAULT_PATH}")
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+company_matcher.py — 企業名の多パターン照合（Aho–Corasick）
+────────────────────────────────────────
+● 企業名リストからオートマトンを 1 度だけ構築
+● 本文を 1 回走査するだけで全企業の出現位置・回数が分かる
+   ├ first()   : 最も前に出る企業（同位置なら長い名前）
+   └ longest() : 出現する中で最も長い企業名
+● 企業数が数千に増えても 1 文書あたりのコストはほぼ一定
+● state() / from_state() で構築済みの表を書き出し・復元できる
+   （company_dict.py が marshal で保存して起動時の構築を省く）
+────────────────────────────────────────
+"""
+
+import re
+from collections import Counter
+
+
+class CompanyScan:
+    """1 回の走査結果。matches は (開始位置, 企業名) を位置順・長い順に保持"""
+    __slots__ = ('matches', '_rank')
+
+    def __init__(self, matches: list, rank: dict) -> None:
+        matches.sort(key=lambda m: (m[0], -len(m[1])))
+        self.matches = matches
+        self._rank = rank
+
+    def first(self):
+        """最も前に出現する企業名（同位置なら最長）。無ければ None"""
+        return self.matches[0][1] if self.matches else None
+
+    def longest(self):
+        """出現する中で最長の企業名（同じ長さならリスト順）。無ければ None"""
+        if not self.matches:
+            return None
+        return min({name for _, name in self.matches},
+                   key=lambda name: (-len(name), self._rank[name]))
+
+    def counts(self) -> Counter:
+        return Counter(name for _, name in self.matches)
+
+    def reduced(self) -> 'CompanyScan':
+        """first() と longest() の答えだけを残した縮約（counts は保たない）"""
+        keep = self.matches[:1]
+        longest = self.longest()
+        if keep and keep[0][1] != longest:
+            keep.append(next(m for m in self.matches if m[1] == longest))
+        return CompanyScan(keep, self._rank)
+
+    def filtered(self, keep) -> 'CompanyScan':
+        """keep(開始位置, 企業名) が真の一致だけを残す"""
+        return CompanyScan([m for m in self.matches if keep(*m)], self._rank)
+
+    @classmethod
+    def concat(cls, scans) -> 'CompanyScan':
+        """断片ごとの走査結果（文書順）を 1 つに。位置は (断片番号, 断片内の位置)
+        企業名が断片をまたがなければ first / longest は全文を走査したときと同じ"""
+        scans = list(scans)
+        matches = [((i, pos), name)
+                   for i, scan in enumerate(scans) for pos, name in scan.matches]
+        return cls(matches, scans[0]._rank if scans else {})
+
+
+class CompanyMatcher:
+    __slots__ = ('names', '_goto', '_fail', '_out', '_rank', '_start')
+
+    def __init__(self, names) -> None:
+        self.names = tuple(dict.fromkeys(names))
+        self._rank = {name: i for i, name in enumerate(self.names)}
+
+        # -- トライ木 --
+        goto, out = [{}], [()]
+        for name in self.names:
+            state = 0
+            for ch in name:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(())
+                state = nxt
+            out[state] = ((name, len(name)),)
+
+        # -- 失敗遷移（幅優先）と出力の継承 --
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for ch, nxt in goto[state].items():
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] += out[fail[nxt]]
+                queue.append(nxt)
+
+        self._goto, self._fail, self._out = goto, fail, out
+        self._compile_start()
+
+    def _compile_start(self) -> None:
+        # 初期状態では企業名の先頭文字まで一気に読み飛ばす
+        goto0 = self._goto[0]
+        self._start = re.compile(
+            '[' + ''.join(re.escape(ch) for ch in goto0) + ']'
+        ) if goto0 else None
+
+    def state(self) -> tuple:
+        """構築済みの表（marshal できる組み込み型だけ）"""
+        return self.names, self._goto, self._fail, self._out
+
+    @classmethod
+    def from_state(cls, state: tuple) -> 'CompanyMatcher':
+        """state() の結果から復元（トライ木・失敗遷移は作り直さない）"""
+        self = cls.__new__(cls)
+        self.names, self._goto, self._fail, self._out = state
+        self._rank = {name: i for i, name in enumerate(self.names)}
+        self._compile_start()
+        return self
+
+    def scan(self, text: str) -> CompanyScan:
+        goto, fail, out, start = self._goto, self._fail, self._out, self._start
+        hits = []
+        state, i, n = 0, 0, len(text)
+        while i < n:
+            if state == 0:
+                m = start.search(text, i) if start else None
+                if m is None:
+                    break
+                i = m.start()
+            ch = text[i]
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            i += 1
+            for name, size in out[state]:
+                hits.append((i - size, name))
+        return CompanyScan(hits, self._rank)
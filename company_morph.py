@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+company_morph.py — 形態素の境目で確かめる企業名検出（Janome・任意）
+────────────────────────────────────────
+● 部分一致の誤検出を除く
+   ├ 例: 「LY」が英単語（ONLY など）の一部、「コマツ」が「コマツナ」の一部
+   └ 一致の先頭と末尾がどちらも形態素の境目にあるものだけを採る
+● 行ごとに Aho–Corasick で候補を探し、候補のある行だけを解析（前段の絞り込み）
+   └ 候補のある行はまとめて 1 回の tokenize に通す
+● 行ごとの結果を行のハッシュで LRU キャッシュ
+   （ライブプレビュー・監視・再実行では同じ行を何度も見る）
+● Tokenizer は辞書の読み込みで生成が重いので、プロセスごとのプールで
+   使い回す（スレッドごとに 1 つまで。ワーカープロセスはそれぞれ初回に生成）
+   └ warm() で先に作っておける（webapp・常駐デーモンの起動時）
+● 環境変数 COMPANY_MORPH=on で有効（clean_engine.morph_scanner が初回に読み込む。
+   無効ならこのモジュールも読み込まない）。janome が無ければ警告して部分一致のまま
+────────────────────────────────────────
+"""
+
+import sys
+import queue
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from company_matcher import CompanyMatcher, CompanyScan
+
+CACHE_LINES = 8192            # 行ごとの結果を保持する数
+POOL_SIZE   = 4               # 同時に解析できるスレッド数（Tokenizer の数）
+
+
+class TokenizerPool:
+    """Tokenizer を必要になった分だけ（size まで）作って使い回す"""
+
+    def __init__(self, size: int = POOL_SIZE) -> None:
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _create(self):
+        from janome.tokenizer import Tokenizer    # 辞書の読み込みは最初の 1 つだけ重い
+        return Tokenizer()
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if not create:
+            return self._idle.get()               # 誰かが返すのを待つ
+        try:
+            return self._create()
+        except BaseException:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def release(self, tokenizer) -> None:
+        self._idle.put(tokenizer)
+
+    def warm(self) -> None:
+        self.release(self.acquire())
+
+    def surfaces(self, text: str) -> list:
+        """分かち書き（表層形の列）"""
+        tokenizer = self.acquire()
+        try:
+            return list(tokenizer.tokenize(text, wakati=True))
+        finally:
+            self.release(tokenizer)
+
+
+class MorphScanner:
+    """CompanyMatcher.scan と同じ呼び方で、境目の合う一致だけを返す"""
+
+    def __init__(self, matcher: CompanyMatcher, pool: Optional[TokenizerPool] = None,
+                 cache_lines: int = CACHE_LINES) -> None:
+        self.matcher = matcher
+        self.pool = pool or TokenizerPool()
+        self.cache_lines = cache_lines
+        self._cache = OrderedDict()               # 行のハッシュ → その行の CompanyScan
+        self._lock = threading.Lock()
+
+    def warm(self) -> None:
+        self.pool.warm()
+
+    def _cached(self, key: bytes) -> Optional[CompanyScan]:
+        with self._lock:
+            scan = self._cache.get(key)
+            if scan is not None:
+                self._cache.move_to_end(key)
+            return scan
+
+    def _store(self, key: bytes, scan: CompanyScan) -> None:
+        with self._lock:
+            self._cache[key] = scan
+            while len(self._cache) > self.cache_lines:
+                self._cache.popitem(last=False)
+
+    def _verify(self, lines: list, scans: list) -> list:
+        """候補のある行をまとめて解析し、境目の合う一致だけに絞る"""
+        joined = '\n'.join(lines)
+        starts, ends, pos = set(), set(), 0
+        for surface in self.pool.surfaces(joined):
+            i = joined.find(surface, pos)         # 空白などを落とす解析器でも位置が合う
+            if i < 0:
+                continue
+            starts.add(i)
+            ends.add(i + len(surface))
+            pos = i + len(surface)
+        verified, base = [], 0
+        for line, scan in zip(lines, scans):
+            starts.add(base)                      # 行頭・行末は常に境目
+            ends.add(base + len(line))
+            verified.append(scan.filtered(
+                lambda at, name, base=base: base + at in starts
+                and base + at + len(name) in ends))
+            base += len(line) + 1
+        return verified
+
+    def scan(self, text: str) -> CompanyScan:
+        """位置は (行番号, 行内の位置)。first / longest は全文の走査と同じ順序"""
+        lines = text.split('\n')
+        results = [None] * len(lines)
+        pending = []                              # (行番号, ハッシュ, 候補)
+        for i, line in enumerate(lines):
+            key = hashlib.blake2b(line.encode('utf-8'), digest_size=16).digest()
+            scan = self._cached(key)
+            if scan is None:
+                scan = self.matcher.scan(line)
+                if scan.matches:
+                    pending.append((i, key, scan))
+                    continue
+                self._store(key, scan)            # 候補なし：解析しない
+            results[i] = scan
+        if pending:
+            verified = self._verify([lines[i] for i, _, _ in pending],
+                                    [scan for _, _, scan in pending])
+            for (i, key, _), scan in zip(pending, verified):
+                self._store(key, scan)
+                results[i] = scan
+        return CompanyScan.concat(results)
+
+
+def open_scanner(matcher: CompanyMatcher) -> Optional[MorphScanner]:
+    """janome があれば作る（無ければ警告して None）"""
+    try:
+        import janome                             # noqa: F401  有無の確認だけ（辞書は後で）
+    except ImportError:
+        print("⚠ COMPANY_MORPH=on ですが janome がありません（部分一致で検出します）",
+              file=sys.stderr)
+        return None
+    return MorphScanner(matcher)
@@ -2,54 +2,373 @@
 """
 template.txt の <企業名> / <銘柄番号> を company_schedule_100days.csv で
 置き換え、prompts/<Day>_<企業名>.md を生成
+
+● 差分だけ書き込む
+   prompts/.manifest.json に出力ごとの (テンプレート・行の内容・日付) の
+   ハッシュを記録し、どれも変わっていない出力は書き換えない（mtime も保つ）
+● 一部の行だけ生成
+   CSV を Day / Code / Company / Sector で索引し、指定した行だけを描画する
+
+  python generate_prompts.py                      # 変わった分だけ
+  python generate_prompts.py --day 42             # Day 42 だけ（1,5,10-20 も可）
+  python generate_prompts.py --sector 半導体 --force
+  python generate_prompts.py --prune              # CSV から消えた行の出力を削除
+
+● 大量生成（銘柄数千 × テンプレート複数の A/B 比較）
+   ├ テンプレートはプレースホルダの位置で切り分けて 1 度だけコンパイルし、
+   │ 各行は断片をつなぐだけで描画する
+   ├ CSV は逐次読み（絞り込みがなければ全行を溜めない）
+   ├ --workers N : 銘柄 × テンプレートの格子を N プロセスで分担
+   └ --format jsonl / tar : 小さなファイルを大量に作らず 1 ファイルへ
+      （jsonl は名前 → 位置の索引 <out>.idx.json も書く）
+
+  python generate_prompts.py --template template.txt --template template_b.txt
+  python generate_prompts.py --format jsonl --out prompts.jsonl --workers 4
 """
 
 from pathlib import Path
-import csv, re
+import csv, io, re, sys, json, time, hashlib, tarfile, argparse, itertools
 from datetime import date          # ① 追加ここだけ
 
 # ======== 設定ここだけ ========
 TEMPLATE_FILE = Path("template.txt")
 CSV_FILE      = Path("company_schedule_100days.csv")
 OUTPUT_DIR    = Path("prompts")
+MANIFEST_FILE = OUTPUT_DIR / ".manifest.json"
+CHUNK_ROWS    = 256             # --workers のとき 1 回に渡す行数
 # ===============================
 
+PLACEHOLDERS = {"<企業名>": "company", "<銘柄番号>": "code"}
+PLACEHOLDER  = re.compile("|".join(map(re.escape, PLACEHOLDERS)))
+
 def sanitize(name: str) -> str:
     """ファイル名に使えない文字（スラッシュなど）を置換"""
     return re.sub(r"[\\/:*?\"<>|]", "_", name)
 
-def main() -> None:
-    template = TEMPLATE_FILE.read_text(encoding="utf-8")
+def sha(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
 
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
-    with CSV_FILE.open(encoding="utf-8-sig", newline="") as f:
+# -------------------------------------------------------------
+# CSV の索引
+# -------------------------------------------------------------
+def iter_rows(path: Path):
+    """CSV を 1 行ずつ {day, code, company, sector, sha} に（全体は溜めない）"""
+    with path.open(encoding="utf-8-sig", newline="") as f:
         reader = csv.DictReader(f)
-
         for i, row in enumerate(reader, start=1):
-            # ---- Day 列が無いときは enumerate で補完 ----
+            # ---- Day 列が無いときは行番号で補完 ----
             day_str = row.get("Day") or row.get("day") or str(i)
-            day     = int(day_str)
-
             company = row.get("Company") or row.get("company")
             code    = row.get("Code")    or row.get("code")
             if company is None or code is None:
                 raise ValueError(
                     f"列名が見つかりません。reader fieldnames = {reader.fieldnames}"
                 )
+            yield {"day": int(day_str), "code": code, "company": company,
+                   "sector": row.get("Sector") or row.get("sector") or "",
+                   "sha": sha("\x1f".join(f"{k}\x1e{v}" for k, v in row.items()))}
+
+
+class Schedule:
+    """CSV の行（Day / Code / Company / Sector）と列ごとの索引"""
+
+    def __init__(self, path: Path) -> None:
+        self.rows = []
+        self.by_day, self.by_code, self.by_company, self.by_sector = {}, {}, {}, {}
+        for rec in iter_rows(path):
+            self.rows.append(rec)
+            self.by_day.setdefault(rec["day"], []).append(rec)
+            self.by_code.setdefault(rec["code"], []).append(rec)
+            self.by_company.setdefault(rec["company"], []).append(rec)
+            self.by_sector.setdefault(rec["sector"], []).append(rec)
+
+    def select(self, days=None, codes=None, companies=None, sectors=None) -> list:
+        """指定された条件すべてに合う行（条件なしなら全行）。CSV の順"""
+        picked = None
+        for index, keys in ((self.by_day, days), (self.by_code, codes),
+                            (self.by_company, companies), (self.by_sector, sectors)):
+            if keys is None:
+                continue
+            ids = {id(rec) for key in keys for rec in index.get(key, ())}
+            picked = ids if picked is None else picked & ids
+        if picked is None:
+            return list(self.rows)
+        return [rec for rec in self.rows if id(rec) in picked]
+
+
+def split_arg(text):
+    """カンマ区切りの引数 → リスト（未指定なら None = 絞り込まない）"""
+    return text.split(",") if text else None
+
+def parse_days(text: str) -> list:
+    """'1,5,10-20' → [1, 5, 10, …, 20]"""
+    days = []
+    for part in text.split(","):
+        lo, _, hi = part.partition("-")
+        days.extend(range(int(lo), int(hi or lo) + 1))
+    return days
+
+
+# -------------------------------------------------------------
+# テンプレートのコンパイル
+#   str.replace をプレースホルダごとに全文へかける代わりに、
+#   位置で切り分けた断片の列を 1 度だけ作り、行ごとには値を差して
+#   つなぐだけにする（日付の追記行も最後の断片に含めておく）
+# -------------------------------------------------------------
+class CompiledTemplate:
+    """parts のうち slots が指す位置に行の値（company / code）が入る
+    prefix: 出力名の前置き（テンプレートが複数なら '<variant>/'）"""
+    __slots__ = ("variant", "prefix", "sha", "today", "parts", "slots")
+
+    def __init__(self, variant: str, text: str, today_str: str, prefix: str = "") -> None:
+        self.variant, self.prefix, self.today = variant, prefix, today_str
+        self.sha = sha(text)
+        parts, slots, pos = [], [], 0
+        for m in PLACEHOLDER.finditer(text):
+            parts.append(text[pos:m.start()])
+            slots.append((len(parts), PLACEHOLDERS[m.group()]))
+            parts.append(None)
+            pos = m.end()
+        # ② 今日の日付を追記
+        parts.append(text[pos:] + f"\n- 現在の日付は{today_str}です。ただし、記事の投稿が今日とは限らないので、記事内で言及は避けてください。\n")
+        self.parts, self.slots = parts, tuple(slots)
+
+    def render(self, rec: dict) -> str:
+        parts = self.parts.copy()
+        for i, field in self.slots:
+            parts[i] = rec[field]
+        return "".join(parts)
+
+def load_templates(paths: list, today_str: str) -> list:
+    nested = len(paths) > 1                       # 複数なら variant ごとのサブディレクトリ
+    seen = {}
+    for p in paths:                               # 同じ <名前>/ に書くと互いに上書きする
+        stem = Path(p).stem
+        if stem in seen:
+            raise ValueError(f"テンプレート名が重複しています: {seen[stem]} と {p}"
+                             f"（出力先 {stem}/ が同じになります）")
+        seen[stem] = p
+    return [CompiledTemplate(Path(p).stem, Path(p).read_text(encoding="utf-8"), today_str,
+                             f"{Path(p).stem}/" if nested else "")
+            for p in paths]
+
+def output_name(rec: dict) -> str:
+    return f"{rec['day']:02d}_{sanitize(rec['company'])}.md"
+
+
+# -------------------------------------------------------------
+# 銘柄 × テンプレートの格子をプロセスで分担
+#   テンプレートは各ワーカーの起動時に 1 回だけ渡し、以後は行の塊だけ送る。
+#   結果は送った順に受け取る（同時に流す塊の数は上限つき）。
+# -------------------------------------------------------------
+_TEMPLATES = []
+
+def _init_worker(templates: list) -> None:
+    global _TEMPLATES
+    _TEMPLATES = templates
+
+def _write_chunk(jobs: list) -> list:
+    """(テンプレート番号, 出力名, 行) の塊を描画して書き込み、出力名を返す"""
+    for ti, name, rec in jobs:
+        (OUTPUT_DIR / name).write_text(_TEMPLATES[ti].render(rec), encoding="utf-8")
+    return [name for _, name, _ in jobs]
+
+def _render_chunk(rows: list) -> list:
+    """行の塊 × 全テンプレートを (出力名, variant, 行, 本文) に"""
+    return [(tpl.prefix + output_name(rec), tpl.variant, rec, tpl.render(rec))
+            for rec in rows for tpl in _TEMPLATES]
 
-            filled = (
-                template
-                .replace("<企業名>", company)
-                .replace("<銘柄番号>", code)
-            )
-            # ② 今日の日付を追記
-            today_str = date.today().strftime("%Y年%m月%d日")
-            filled += f"\n- 現在の日付は{today_str}です。ただし、記事の投稿が今日とは限らないので、記事内で言及は避けてください。\n"
+def chunked(items, size: int):
+    items = iter(items)
+    while True:
+        chunk = list(itertools.islice(items, size))
+        if not chunk:
+            return
+        yield chunk
 
-            filename = f"{day:02d}_{sanitize(company)}.md"
-            (OUTPUT_DIR / filename).write_text(filled, encoding="utf-8")
-            print(f"✔ created {filename}")
+def map_chunks(fn, chunks, templates: list, workers: int = 1):
+    """chunks を fn で処理した結果を順に返す（workers > 1 ならプロセスで分担）"""
+    if workers <= 1:
+        _init_worker(templates)
+        yield from map(fn, chunks)
+        return
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(templates,)) as pool:
+        window = deque()
+        for chunk in chunks:
+            window.append(pool.submit(fn, chunk))
+            if len(window) >= workers * 4:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+
+# -------------------------------------------------------------
+# 出力 1: 個別ファイル（差分だけ書き込み）
+# -------------------------------------------------------------
+def load_manifest() -> dict:
+    if MANIFEST_FILE.exists():
+        return json.loads(MANIFEST_FILE.read_text(encoding="utf-8"))
+    return {}
+
+def save_manifest(manifest: dict) -> None:
+    tmp = MANIFEST_FILE.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, sort_keys=True,
+                              separators=(",", ":")), encoding="utf-8")
+    tmp.replace(MANIFEST_FILE)
+
+def generate(rows, templates: list, manifest: dict, force: bool = False,
+             workers: int = 1) -> tuple:
+    """変わった出力だけ書く。(書いた数, 変更なしの数)"""
+    unchanged = 0
+
+    def pending():
+        nonlocal unchanged
+        for rec in rows:
+            for ti, tpl in enumerate(templates):
+                name = tpl.prefix + output_name(rec)
+                key = {"template": tpl.sha, "row": rec["sha"], "date": tpl.today}
+                if not force and manifest.get(name) == key and (OUTPUT_DIR / name).exists():
+                    unchanged += 1
+                    continue
+                manifest[name] = key              # 失敗時は manifest を保存しない
+                yield ti, name, rec
+
+    for tpl in templates:
+        (OUTPUT_DIR / tpl.prefix).mkdir(parents=True, exist_ok=True)
+    written = 0
+    for names in map_chunks(_write_chunk, chunked(pending(), CHUNK_ROWS), templates, workers):
+        for name in names:
+            print(f"✔ created {name}")
+        written += len(names)
+    return written, unchanged
+
+def prune(templates: list, manifest: dict) -> int:
+    """CSV に対応する行が無くなった出力を削除
+    今回のテンプレートの出力（同じ前置き）だけが対象。--template で一部の
+    バリアントだけ指定しても、他のバリアントの出力は消さない"""
+    prefixes = {tpl.prefix for tpl in templates}
+    alive = {tpl.prefix + output_name(rec) for rec in iter_rows(CSV_FILE) for tpl in templates}
+    removed = 0
+    for filename in sorted(set(manifest) - alive):
+        if filename[:filename.rfind('/') + 1] not in prefixes:
+            continue
+        (OUTPUT_DIR / filename).unlink(missing_ok=True)
+        del manifest[filename]
+        removed += 1
+        print(f"✖ removed {filename}")
+    return removed
+
+
+# -------------------------------------------------------------
+# 出力 2: 1 ファイルにまとめる（jsonl + 索引 / tar）
+# -------------------------------------------------------------
+class JsonlArchive:
+    """1 行 1 件の JSONL と、出力名 → [開始バイト, バイト数] の索引 <out>.idx.json"""
+
+    def __init__(self, path: Path) -> None:
+        self.path, self.index = path, {}
+        self.tmp = path.with_name(path.name + ".tmp")
+        self.f = self.tmp.open("wb")
+
+    def add(self, name: str, variant: str, rec: dict, text: str) -> None:
+        line = json.dumps({"name": name, "variant": variant, "day": rec["day"],
+                           "code": rec["code"], "company": rec["company"],
+                           "sector": rec["sector"], "text": text},
+                          ensure_ascii=False).encode("utf-8") + b"\n"
+        self.index[name] = [self.f.tell(), len(line)]
+        self.f.write(line)
+
+    def close(self) -> None:
+        self.f.close()
+        self.tmp.replace(self.path)
+        index_path = Path(f"{self.path}.idx.json")
+        index_path.write_text(json.dumps(self.index, ensure_ascii=False), encoding="utf-8")
+
+
+class TarArchive:
+    """<variant>/<Day>_<企業名>.md を並べた tar（.tar.gz / .tgz なら圧縮）"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.tmp = path.with_name(path.name + ".tmp")
+        gz = path.name.endswith((".tar.gz", ".tgz"))
+        self.tar = tarfile.open(self.tmp, "w:gz" if gz else "w")
+        self.mtime = int(time.time())
+
+    def add(self, name: str, variant: str, rec: dict, text: str) -> None:
+        data = text.encode("utf-8")
+        info = tarfile.TarInfo(name)
+        info.size, info.mtime = len(data), self.mtime
+        self.tar.addfile(info, io.BytesIO(data))
+
+    def close(self) -> None:
+        self.tar.close()
+        self.tmp.replace(self.path)
+
+
+def read_jsonl_prompt(path: Path, name: str) -> dict:
+    """索引を使って JSONL から 1 件だけ読む"""
+    index = json.loads(Path(f"{path}.idx.json").read_text(encoding="utf-8"))
+    start, length = index[name]
+    with Path(path).open("rb") as f:
+        f.seek(start)
+        return json.loads(f.read(length))
+
+def write_archive(rows, templates: list, fmt: str, path: Path, workers: int = 1) -> int:
+    archive = JsonlArchive(path) if fmt == "jsonl" else TarArchive(path)
+    count = 0
+    for results in map_chunks(_render_chunk, chunked(rows, CHUNK_ROWS), templates, workers):
+        for item in results:
+            archive.add(*item)
+        count += len(results)
+    archive.close()
+    return count
+
+
+def main(argv: list = ()) -> None:
+    parser = argparse.ArgumentParser(description="プロンプトを差分生成")
+    parser.add_argument("--day", help="Day（例: 42 / 1,5,10-20）")
+    parser.add_argument("--code", help="銘柄番号（カンマ区切り）")
+    parser.add_argument("--company", help="企業名（カンマ区切り）")
+    parser.add_argument("--sector", help="業種（カンマ区切り）")
+    parser.add_argument("--force", action="store_true", help="変更がなくても書き直す")
+    parser.add_argument("--prune", action="store_true", help="CSV から消えた行の出力を削除")
+    parser.add_argument("--template", action="append",
+                        help=f"テンプレート（複数指定で A/B 用に <名前>/ へ振り分け。既定: {TEMPLATE_FILE}）")
+    parser.add_argument("--format", choices=("files", "jsonl", "tar"), default="files")
+    parser.add_argument("--out", help="jsonl / tar の出力先（既定: prompts.jsonl / prompts.tar）")
+    parser.add_argument("--workers", type=int, default=1, help="描画するプロセス数")
+    args = parser.parse_args(list(argv))
+
+    today_str = date.today().strftime("%Y年%m月%d日")      # 実行中に 1 回だけ
+    try:
+        templates = load_templates(args.template or [TEMPLATE_FILE], today_str)
+    except ValueError as e:
+        parser.error(str(e))
+    if any((args.day, args.code, args.company, args.sector)):
+        rows = Schedule(CSV_FILE).select(parse_days(args.day) if args.day else None,
+                                         split_arg(args.code), split_arg(args.company),
+                                         split_arg(args.sector))
+    else:
+        rows = iter_rows(CSV_FILE)                # 絞り込まなければ逐次読み
+
+    if args.format != "files":
+        out = Path(args.out or f"prompts.{args.format}")
+        count = write_archive(rows, templates, args.format, out, args.workers)
+        print(f"✔ {out}: {count} 件")
+        return
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest()
+    written, unchanged = generate(rows, templates, manifest, args.force, args.workers)
+    removed = prune(templates, manifest) if args.prune else 0
+    if written or removed:
+        save_manifest(manifest)
+    print(f"対象 {written + unchanged} 件: 書き込み {written} / 変更なし {unchanged}"
+          + (f" / 削除 {removed}" if args.prune else ""))
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1:])
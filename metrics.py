@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+metrics.py — Prometheus テキスト形式のメトリクス（webapp の /metrics）
+────────────────────────────────────────
+● 標準ライブラリだけの Counter / Gauge / Histogram
+   └ prometheus_client は使わない（依存を増やさず、必要な分だけ）
+● ラベル付きの値は labels(値, …) で子を取り出して inc / observe
+   ├ 子は作成時に 1 度だけ辞書へ登録（以後はタプルで引くだけ）
+   └ 1 回の記録はロック 1 回＋bisect 1 回。常時有効にしておける
+● render() で全メトリクスを text/plain; version=0.0.4 の形に
+   └ collect に登録した関数はその直前に呼ばれる（キャッシュ件数など
+      取得時にだけ読めばよい値を、その場で Gauge / Counter に写す）
+● 値はこのプロセスの分だけ（複数プロセスで動かすなら個別に取得）
+────────────────────────────────────────
+"""
+
+import time
+import threading
+from bisect import bisect_left
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# 秒（0.5 ms 〜 10 s）とバイト（256 B 〜 64 MB）の既定の区切り
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTE_BUCKETS    = tuple(256 * 4 ** i for i in range(10))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# -------------------------------------------------------------
+# 子（ラベルの値ごとの実体）
+# -------------------------------------------------------------
+class _Value:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self) -> None:
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _Histogram:
+    __slots__ = ('bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, bounds: tuple) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)     # 末尾が +Inf
+        self.sum    = 0.0
+        self._lock  = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self.bounds, value)       # le（以下）なので左側
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self) -> '_Timer':
+        return _Timer(self)
+
+    def snapshot(self) -> tuple:
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class _Timer:
+    __slots__ = ('hist', '_t0')
+
+    def __init__(self, hist: _Histogram) -> None:
+        self.hist = hist
+
+    def __enter__(self) -> '_Timer':
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.hist.observe(time.perf_counter() - self._t0)
+
+
+# -------------------------------------------------------------
+# メトリクス（名前・説明・ラベル名 → 子の集合）
+# -------------------------------------------------------------
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, doc: str, labelnames: tuple = ()) -> None:
+        self.name, self.doc, self.labelnames = name, doc, tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_child(self):
+        return _Value()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name}: ラベルは {self.labelnames} です")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _samples(self):
+        for values, child in sorted(self._children.items()):
+            yield self.name, _labels(self.labelnames, values), child.value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{name}{labels} {_number(value)}" for name, labels, value in self._samples()]
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1) -> None:
+        self._default.inc(amount)
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, amount: float = 1) -> None:
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self._default.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, doc: str, labelnames: tuple = (),
+                 buckets: tuple = LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, doc, labelnames)
+
+    def _new_child(self) -> _Histogram:
+        return _Histogram(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def time(self) -> _Timer:
+        return self._default.time()
+
+    def _samples(self):
+        for values, child in sorted(self._children.items()):
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket", _labels(self.labelnames, values, le), cumulative
+            labels = _labels(self.labelnames, values)
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+# -------------------------------------------------------------
+# 登録先
+# -------------------------------------------------------------
+class Registry:
+    def __init__(self) -> None:
+        self.metrics = []
+        self.collectors = []
+
+    def _add(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, doc: str, labelnames: tuple = ()) -> Counter:
+        return self._add(Counter(name, doc, labelnames))
+
+    def gauge(self, name: str, doc: str, labelnames: tuple = ()) -> Gauge:
+        return self._add(Gauge(name, doc, labelnames))
+
+    def histogram(self, name: str, doc: str, labelnames: tuple = (),
+                  buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, doc, labelnames, buckets))
+
+    def collect(self, fn):
+        """取得のたびに fn() を呼ぶ（デコレータとしても使える）"""
+        self.collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        for fn in self.collectors:
+            fn()
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+near_dup.py — 過去記事との類似検出（MinHash＋LSH 索引）
+────────────────────────────────────────
+● 本文を空白抜きの文字 5-gram の集合にし、MinHash 署名（128 値）に縮める
+   └ 1 回のハッシュで 128 区画の最小値を取る one permutation hashing
+      （空の区画は右隣から借りる）。置換を 128 回かけるより 2 桁速い
+● 署名を 32 帯 × 4 値に分け、帯ごとのバケットを SQLite に索引
+   ├ 候補 = どれかの帯でバケットが一致した過去記事（全件とは比べない）
+   ├ 候補だけ署名から Jaccard 類似度を推定し、しきい値以上を返す
+   │  （類似度 0.6 なら 99 % 近くが候補に挙がる）
+   └ 記事ごとに行を足すだけの追加更新
+● 記事は「入力ファイル｜企業名｜日付」で識別し、記事ごとに最新の 1 版だけ索引
+   ├ 同じ原稿の再実行・--watch の保存では前の版の署名を置き換える
+   └ 照合でも同じ記事の版は除く（自分の前の版を重複と報告しない）
+● 保存先は実行ログ保管庫と同じディレクトリの near_dup.sqlite3
+   （run_id は run_store.py と共通なので export で本文を取り出せる）
+   └ 索引は保管庫から作り直せるので、形式が変わったら捨てて作り直す（backfill）
+      backfill では入力のパスが分からないので「企業名｜日付」を 1 記事とみなす
+● 環境変数 NEAR_DUP=<しきい値>（0〜1）で変更、NEAR_DUP=off で無効
+   └ remove.py の --stream は照合しない（本文をメモリに載せないため）
+
+  python near_dup.py check body.txt    # 索引と照合だけ（追加しない・同じ本文は除く）
+  python near_dup.py backfill          # 保管庫の過去の実行を索引へ
+────────────────────────────────────────
+"""
+
+import os
+import sys
+import zlib
+import hashlib
+from array import array
+from datetime import datetime
+from typing import Optional
+
+SHINGLE   = 5                 # 文字 n-gram の長さ
+BINS      = 128               # 署名の長さ（2 の冪）
+ROWS      = 4                 # 1 帯あたりの値の数（帯の数 = BINS / ROWS）
+THRESHOLD = 0.6               # これ以上の推定 Jaccard 類似度を報告
+
+_BIN_BITS = BINS.bit_length() - 1              # 下位ビットで区画、残りが値
+
+SCHEMA_VERSION = 2            # 違えば索引を捨てて作り直す
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signatures (
+    run_id   INTEGER PRIMARY KEY,
+    ts       TEXT NOT NULL,
+    article  TEXT NOT NULL,
+    company  TEXT NOT NULL,
+    body_sha TEXT NOT NULL,
+    sig      BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS signatures_article ON signatures(article);
+CREATE TABLE IF NOT EXISTS bands (
+    band   INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    run_id INTEGER NOT NULL,
+    PRIMARY KEY (band, bucket, run_id)
+) WITHOUT ROWID;
+"""
+
+
+# -------------------------------------------------------------
+# 署名
+# -------------------------------------------------------------
+def shingles(text: str) -> set:
+    text = ''.join(text.split())                  # 改行・字下げの違いは無視
+    return {text[i:i + SHINGLE] for i in range(len(text) - SHINGLE + 1)}
+
+def signature(text: str) -> Optional[array]:
+    """BINS 個の 32 bit 値。SHINGLE 文字に満たない本文は None"""
+    grams = shingles(text)
+    if not grams:
+        return None
+    mins = [-1] * BINS
+    for gram in grams:
+        h = zlib.crc32(gram.encode('utf-8'))      # 版・プロセスによらず同じ値
+        b, v = h & (BINS - 1), h >> _BIN_BITS
+        if mins[b] < 0 or v < mins[b]:
+            mins[b] = v
+    # 空の区画は右隣（循環）の値を距離付きで借りる（densification）
+    sig = array('I', [0] * BINS)
+    for b in range(BINS):
+        dist = 0
+        while mins[(b + dist) % BINS] < 0:
+            dist += 1
+        sig[b] = (dist << (32 - _BIN_BITS)) | mins[(b + dist) % BINS]
+    return sig
+
+def similarity(a: array, b: array) -> float:
+    """一致する区画の割合 ≒ Jaccard 類似度"""
+    return sum(x == y for x, y in zip(a, b)) / BINS
+
+def band_keys(sig: array) -> list:
+    """[(帯番号, バケット)]。バケットは帯の値の 63 bit ハッシュ"""
+    raw = sig.tobytes()
+    step = ROWS * sig.itemsize
+    return [(i, int.from_bytes(hashlib.blake2b(raw[i * step:(i + 1) * step],
+                                                digest_size=8).digest(), 'big') >> 1)
+            for i in range(BINS // ROWS)]
+
+def article_key(source: str, company: str, day: str) -> str:
+    """記事の識別子。source は入力ファイルの絶対パス（分からなければ空）"""
+    return f"{source}|{company}|{day}"
+
+
+# -------------------------------------------------------------
+# 索引
+# -------------------------------------------------------------
+class Match:
+    __slots__ = ('run_id', 'ts', 'company', 'similarity')
+
+    def __init__(self, run_id: int, ts: str, company: str, similarity: float) -> None:
+        self.run_id, self.ts, self.company, self.similarity = run_id, ts, company, similarity
+
+
+class NearDupIndex:
+    __slots__ = ('path', 'threshold', '_conn', '_pid')
+
+    def __init__(self, root: str, threshold: float = THRESHOLD) -> None:
+        self.path = os.path.join(root, 'near_dup.sqlite3')
+        self.threshold = threshold
+        self._conn, self._pid = None, None
+
+    def _db(self) -> 'sqlite3.Connection':
+        if self._conn is None or self._pid != os.getpid():   # fork 後は開き直す
+            import sqlite3                        # 初回照合まで遅らせる（起動を軽く）
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            if conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+                conn.executescript('DROP TABLE IF EXISTS signatures; DROP TABLE IF EXISTS bands;'
+                                   f'PRAGMA user_version = {SCHEMA_VERSION};')
+            conn.executescript(SCHEMA)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def query(self, sig: array, article: Optional[str] = None,
+              body_sha: Optional[str] = None) -> list:
+        """しきい値以上の過去記事を類似度の高い順に
+        article と同じ記事（前の版）・body_sha と同じ本文は除く"""
+        keys = band_keys(sig)
+        db = self._db()
+        rows = db.execute(
+            'SELECT DISTINCT run_id FROM bands WHERE (band, bucket) IN (VALUES '
+            + ','.join('(?, ?)' for _ in keys) + ')',
+            [x for key in keys for x in key]).fetchall()
+        if not rows:
+            return []
+        found = db.execute(
+            'SELECT run_id, ts, article, company, body_sha, sig FROM signatures WHERE run_id IN ('
+            + ','.join('?' for _ in rows) + ')', [r[0] for r in rows])
+        matches = []
+        for run_id, ts, key, company, sha, blob in found:
+            if key == article or sha == body_sha:
+                continue
+            score = similarity(sig, array('I', blob))
+            if score >= self.threshold:
+                matches.append(Match(run_id, ts, company, score))
+        matches.sort(key=lambda m: (-m.similarity, m.run_id))
+        return matches
+
+    def add(self, run_id: int, article: str, company: str, sig: array, body_sha: str,
+            ts: Optional[str] = None) -> bool:
+        """索引へ追加（同じ記事の前の版は置き換える）。run_id が索引済みなら False"""
+        ts = ts or datetime.now().isoformat(timespec='seconds')
+        with self._db() as db:
+            old = [r[0] for r in db.execute('SELECT run_id FROM signatures WHERE article = ?',
+                                            (article,))]
+            if run_id in old:
+                return False
+            for prev in old:
+                db.execute('DELETE FROM bands WHERE run_id = ?', (prev,))
+            db.execute('DELETE FROM signatures WHERE article = ?', (article,))
+            db.execute('INSERT INTO signatures VALUES (?, ?, ?, ?, ?, ?)',
+                       (run_id, ts, article, company, body_sha, sig.tobytes()))
+            db.executemany('INSERT OR IGNORE INTO bands VALUES (?, ?, ?)',
+                           [(band, bucket, run_id) for band, bucket in band_keys(sig)])
+        return True
+
+    def check_and_add(self, run_id: int, article: str, company: str, body: str) -> list:
+        """照合してから追加。類似する他の記事（Match）の一覧を返す"""
+        sig = signature(body)
+        if sig is None:
+            return []
+        matches = self.query(sig, article)
+        self.add(run_id, article, company, sig,
+                 hashlib.sha256(body.encode('utf-8')).hexdigest())
+        return matches
+
+    def indexed(self) -> set:
+        return {r[0] for r in self._db().execute('SELECT run_id FROM signatures')}
+
+    def covered(self) -> set:
+        """索引済みの (企業名, 日付)"""
+        return {(company, ts[:10]) for company, ts
+                in self._db().execute('SELECT company, ts FROM signatures')}
+
+
+def open_index(root: str) -> Optional[NearDupIndex]:
+    """環境変数 NEAR_DUP に従って開く（off なら None）
+    on / 1 / yes / 空は既定のしきい値、0〜1 の数値はそのしきい値。
+    どれでもなければ警告して既定のしきい値"""
+    value = os.environ.get('NEAR_DUP', '').strip().lower()
+    if value in ('0', 'off', 'no'):
+        return None
+    threshold = THRESHOLD
+    if value not in ('', '1', 'on', 'yes'):
+        try:
+            threshold = float(value)
+        except ValueError:
+            threshold = None
+        if threshold is None or not 0 < threshold <= 1:
+            print(f"⚠ NEAR_DUP={value} は解釈できません（on / off / 0〜1 の数値）。"
+                  f"しきい値 {THRESHOLD:.0%} で照合します", file=sys.stderr)
+            threshold = THRESHOLD
+    return NearDupIndex(root, threshold)
+
+
+def report(matches: list, threshold: float = THRESHOLD, out=None) -> None:
+    out = out or sys.stdout
+    if not matches:
+        return
+    print(f"⚠ 過去の記事とよく似ています（推定類似度 {threshold:.0%} 以上が "
+          f"{len(matches)} 件）:", file=out)
+    for m in matches[:10]:
+        print(f"   run {m.run_id:>6}  {m.ts}  {m.similarity:5.0%}  {m.company}", file=out)
+    if len(matches) > 10:
+        print(f"   …ほか {len(matches) - 10} 件", file=out)
+
+
+# -------------------------------------------------------------
+# コマンドライン
+# -------------------------------------------------------------
+def main(argv: list) -> int:
+    import argparse
+    from run_store import RunStore
+    parser = argparse.ArgumentParser(description="過去記事との類似検出（MinHash＋LSH）")
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('check', help="本文ファイルを索引と照合（追加しない）")
+    p.add_argument('path')
+    sub.add_parser('backfill', help="実行ログ保管庫の過去の実行（body.txt）を索引へ")
+    parser.add_argument('--threshold', type=float, default=None)
+    args = parser.parse_args(argv)
+
+    store = RunStore()
+    index = NearDupIndex(store.root)
+    if args.threshold is not None:
+        index.threshold = args.threshold
+
+    from clean_engine import DISCLAIMER          # 全記事共通の免責文は比べない
+    if args.cmd == 'check':
+        with open(args.path, encoding='utf-8') as f:
+            body = f.read().replace(DISCLAIMER, '')
+        sig = signature(body)
+        sha = hashlib.sha256(body.encode('utf-8')).hexdigest()
+        matches = index.query(sig, body_sha=sha) if sig is not None else []
+        report(matches, index.threshold)
+        print(f"✔ 類似 {len(matches)} 件（しきい値 {index.threshold:.0%}）")
+        return 1 if matches else 0
+
+    done, covered, added = index.indexed(), index.covered(), 0
+    for run_id, ts, tool, company, _ in sorted(store.query(), reverse=True):   # 新しい順
+        sha = store.files(run_id).get('body.txt')
+        if run_id in done or (company, ts[:10]) in covered or sha is None:
+            continue                              # 同じ日の同じ企業は最新の版だけ
+        body = store.get_blob(sha).decode('utf-8').replace(DISCLAIMER, '')
+        sig = signature(body)
+        if sig is not None:                       # 入力のパスは保管庫に無いので企業名と日付で
+            added += index.add(run_id, article_key('', company, ts[:10]), company, sig,
+                               hashlib.sha256(body.encode('utf-8')).hexdigest(), ts)
+            covered.add((company, ts[:10]))
+    print(f"✔ {added} 件を索引に追加しました")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
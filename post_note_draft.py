@@ -1,35 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+post_note_draft.py — 整形済み記事を note の下書きに保存
+────────────────────────────────────────
+● 引数なし : output/ の 1 本（remove.py 実行後に存在する前提）
+● --batch  : remove.py --batch の出力先ルート配下の記事ディレクトリを一括投稿
+   ├ ワーカーごとにログインは 1 回だけ（クライアントを使い回す）
+   ├ 並列数（--workers）と全体の投稿ペース（--rate 件/分）を指定できる
+   ├ 失敗したら待ち時間を倍々にして再試行（--retries）
+   └ 結果を <ルート>/upload_manifest.json に記録し、再実行時は
+      投稿済み（内容ハッシュが同じ）の記事を飛ばす
+● --fake   : note へ接続しない偽クライアント（遅延・失敗率・ログイン時間を
+   再現）。スループットや再試行の確認をオフラインで行える
+
+  python post_note_draft.py
+  python post_note_draft.py --batch output/ --workers 2 --rate 6
+  python post_note_draft.py --batch output/ --fake --fail-rate 0.3
+  ※ 本物の投稿には .env の NOTE_EMAIL / NOTE_PASSWORD / NOTE_USER_ID が必要
+────────────────────────────────────────
+"""
+
 import os
-from dotenv import load_dotenv
+import sys
+import json
+import time
+import random
+import hashlib
+import threading
 from pathlib import Path
-from note_client import Note
-   # ← ライブラリのモジュール名に合わせて下さい
-
-# 1. 環境変数ロード
-load_dotenv()
-
-EMAIL    = os.getenv("NOTE_EMAIL")
-PASSWORD = os.getenv("NOTE_PASSWORD")
-USER_ID  = os.getenv("NOTE_USER_ID")
-
-if not all([EMAIL, PASSWORD, USER_ID]):
-    raise RuntimeError("NOTE_EMAIL / NOTE_PASSWORD / NOTE_USER_ID が設定されていません")
-
-# 2. 3分割ファイル読み込み（remove.py 実行後に存在する前提）
-out_dir = Path("output")
-title     = (out_dir/"title.txt").read_text("utf-8")
-body      = (out_dir/"body.txt" ).read_text("utf-8")
-tags_line = (out_dir/"hashtags.txt").read_text("utf-8")
-tags      = tags_line.strip().split()
-
-# 3. NoteClient でログイン & 下書き作成
-note = Note(email=EMAIL, password=PASSWORD, user_id=USER_ID)
-
-note.create_article(
-    title           = title,
-    file_name       = out_dir/"body.txt",   # 本文ファイルを渡す実装が多い
-    input_tag_list  = tags,
-    post_setting    = False,                # False = 草稿 / 下書き
-    headless        = True                  # ブラウザを開かない
-)
-
-print("✅ note に下書きを保存しました")
\ No newline at end of file
+from typing import Optional
+
+# dotenv / note_client は本物に投稿するときだけ読み込む（--fake では不要）
+
+DRAFT_FILES   = ('title.txt', 'body.txt', 'hashtags.txt')
+MANIFEST_NAME = 'upload_manifest.json'
+
+
+# -------------------------------------------------------------
+# 記事ディレクトリ（title.txt / body.txt / hashtags.txt）
+# -------------------------------------------------------------
+class Draft:
+    __slots__ = ('path', 'title', 'body_path', 'tags', 'sha')
+
+    def __init__(self, path: Path) -> None:
+        self.path      = path
+        self.title     = (path / 'title.txt').read_text('utf-8')
+        self.body_path = path / 'body.txt'
+        tags_line      = (path / 'hashtags.txt').read_text('utf-8')
+        self.tags      = tags_line.strip().split()
+        h = hashlib.sha256()
+        for name in DRAFT_FILES:                  # 内容が変われば別の下書き
+            h.update((path / name).read_bytes() + b'\0')
+        self.sha = h.hexdigest()
+
+
+def is_draft_dir(path: Path) -> bool:
+    return all((path / name).is_file() for name in DRAFT_FILES)
+
+def find_drafts(root: Path) -> list:
+    """root 自身、または直下のサブディレクトリのうち 3 ファイルが揃ったもの"""
+    if is_draft_dir(root):
+        return [Draft(root)]
+    return [Draft(p) for p in sorted(root.iterdir()) if p.is_dir() and is_draft_dir(p)]
+
+
+# -------------------------------------------------------------
+# 投稿記録（再実行時に投稿済みを飛ばす）
+# -------------------------------------------------------------
+class Manifest:
+    """{内容ハッシュ: {dir, status, attempts, at, error}} の JSON。記録のたびに保存"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = json.loads(path.read_text('utf-8')) if path.exists() else {}
+
+    def uploaded(self, draft: Draft) -> bool:
+        return self.entries.get(draft.sha, {}).get('status') == 'ok'
+
+    def record(self, draft: Draft, status: str, attempts: int,
+               error: Optional[str] = None) -> None:
+        with self._lock:
+            self.entries[draft.sha] = {
+                'dir': str(draft.path), 'status': status, 'attempts': attempts,
+                'at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'error': error,
+            }
+            tmp = self.path.with_suffix('.tmp')
+            tmp.write_text(json.dumps(self.entries, ensure_ascii=False, indent=1), 'utf-8')
+            os.replace(tmp, self.path)            # 途中で止まっても壊れない
+
+
+# -------------------------------------------------------------
+# 投稿ペース（全ワーカー共通で per_minute 件/分まで）
+# -------------------------------------------------------------
+class RateLimiter:
+    def __init__(self, per_minute: float) -> None:
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:                          # 枠を予約してから眠る
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        time.sleep(slot - now)
+
+
+# -------------------------------------------------------------
+# クライアント（本物 / オフライン用の偽物）
+# -------------------------------------------------------------
+def open_note():
+    """本物の note クライアント。環境変数が無ければ RuntimeError"""
+    from dotenv import load_dotenv
+    from note_client import Note   # ← ライブラリのモジュール名に合わせて下さい
+    load_dotenv()
+    email    = os.getenv("NOTE_EMAIL")
+    password = os.getenv("NOTE_PASSWORD")
+    user_id  = os.getenv("NOTE_USER_ID")
+    if not all([email, password, user_id]):
+        raise RuntimeError("NOTE_EMAIL / NOTE_PASSWORD / NOTE_USER_ID が設定されていません")
+    return Note(email=email, password=password, user_id=user_id)
+
+
+class FakeNote:
+    """note の代わりにメモリへ保存する偽クライアント（Note と同じ呼び出し方）
+    login 秒かけて生成し、1 件ごとに latency 秒前後かかり、fail_rate の割合で失敗する"""
+    posted = []                                   # 全インスタンス共通の投稿記録
+    _lock  = threading.Lock()
+
+    def __init__(self, latency: float = 0.2, fail_rate: float = 0.0,
+                 login: float = 1.0, seed: Optional[int] = None) -> None:
+        self.latency, self.fail_rate = latency, fail_rate
+        self._rng = random.Random(seed)
+        time.sleep(login)                         # ブラウザ起動＋ログイン相当
+
+    def create_article(self, title: str, file_name, input_tag_list: list,
+                       post_setting: bool = False, headless: bool = True) -> dict:
+        time.sleep(self.latency * self._rng.uniform(0.5, 1.5))
+        if self._rng.random() < self.fail_rate:
+            raise ConnectionError("偽クライアント: 一時的な失敗")
+        with self._lock:
+            self.posted.append((time.monotonic(), title))
+        return {'run': 'success', 'title': title}
+
+
+def post_draft(client, draft: Draft) -> None:
+    client.create_article(
+        title           = draft.title,
+        file_name       = draft.body_path,      # 本文ファイルを渡す実装が多い
+        input_tag_list  = draft.tags,
+        post_setting    = False,                # False = 草稿 / 下書き
+        headless        = True                  # ブラウザを開かない
+    )
+
+
+# -------------------------------------------------------------
+# 一括投稿
+# -------------------------------------------------------------
+def post_with_retry(client, draft: Draft, limiter: RateLimiter,
+                    retries: int, backoff: float) -> tuple:
+    """(成功したか, 試行回数, 最後のエラー)。待ち時間は backoff × 2^n ＋ゆらぎ"""
+    error = None
+    for attempt in range(1, retries + 2):
+        limiter.wait()
+        try:
+            post_draft(client, draft)
+            return True, attempt, None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if attempt <= retries:
+                time.sleep(backoff * 2 ** (attempt - 1) * random.uniform(1.0, 1.5))
+    return False, retries + 1, error
+
+
+def run_batch(drafts: list, make_client, manifest: Manifest, workers: int = 1,
+              per_minute: float = 0.0, retries: int = 3, backoff: float = 2.0) -> int:
+    """未投稿の drafts をワーカーで分担して投稿。失敗件数を返す"""
+    pending = [d for d in drafts if not manifest.uploaded(d)]
+    skipped = len(drafts) - len(pending)
+    print(f"対象 {len(drafts)} 件（投稿済みで省略 {skipped} 件）")
+    if not pending:
+        return 0
+
+    queue   = list(reversed(pending))             # pop() で先頭から
+    lock    = threading.Lock()
+    limiter = RateLimiter(per_minute)
+    failed  = []
+
+    def worker() -> None:
+        client = None
+        while True:
+            with lock:
+                if not queue:
+                    return
+                draft = queue.pop()
+            try:
+                if client is None:
+                    client = make_client()        # ログインはワーカーごとに 1 回
+            except Exception as e:
+                ok, attempts, error = False, 0, f"{type(e).__name__}: {e}"
+            else:
+                ok, attempts, error = post_with_retry(client, draft, limiter, retries, backoff)
+            manifest.record(draft, 'ok' if ok else 'failed', attempts, error)
+            mark = '✔' if ok else '✖'
+            print(f"{mark} {draft.path}  試行 {attempts} 回" + (f"  {error}" if error else ''))
+            if not ok:
+                with lock:
+                    failed.append(draft)
+
+    start   = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(max(1, min(workers, len(pending))))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    done = len(pending) - len(failed)
+    print(f"✔ 成功 {done} / 失敗 {len(failed)}  経過 {elapsed:.1f} s "
+          f"（{done / elapsed * 60:.1f} 件/分）")
+    return len(failed)
+
+
+# -------------------------------------------------------------
+# スクリプト直接実行
+# -------------------------------------------------------------
+def parse_args(argv: list) -> 'argparse.Namespace':
+    import argparse
+    parser = argparse.ArgumentParser(description="整形済み記事を note の下書きに保存")
+    parser.add_argument('--batch', metavar='ROOT',
+                        help="記事ディレクトリ（title/body/hashtags.txt）を含むルートを一括投稿")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="並列数（ワーカーごとにログインしてセッションを保持）")
+    parser.add_argument('--rate', type=float, default=0.0,
+                        help="全体で 1 分あたりの投稿数の上限（0 = 無制限）")
+    parser.add_argument('--retries', type=int, default=3)
+    parser.add_argument('--backoff', type=float, default=2.0,
+                        help="再試行の初回待ち時間（秒、以後倍々）")
+    parser.add_argument('--manifest', help=f"投稿記録（既定: <ROOT>/{MANIFEST_NAME}）")
+    parser.add_argument('--fake', action='store_true',
+                        help="note に接続しない偽クライアントで試す")
+    parser.add_argument('--latency', type=float, default=0.2, help="--fake の 1 件あたり秒数")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="--fake の失敗率")
+    parser.add_argument('--login', type=float, default=1.0, help="--fake のログイン秒数")
+    return parser.parse_args(argv)
+
+
+def main(argv: list) -> int:
+    args = parse_args(argv)
+    if args.fake:
+        def make_client():
+            return FakeNote(args.latency, args.fail_rate, args.login)
+    else:
+        make_client = open_note
+
+    if not args.batch:                            # 従来どおり output/ の 1 本
+        post_draft(make_client(), Draft(Path("output")))
+        print("✅ note に下書きを保存しました")
+        return 0
+
+    root = Path(args.batch)
+    manifest = Manifest(Path(args.manifest) if args.manifest else root / MANIFEST_NAME)
+    failed = run_batch(find_drafts(root), make_client, manifest, args.workers,
+                       args.rate, args.retries, args.backoff)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -10,165 +10,95 @@ remove.py — note 用 Markdown クリーナー ＋ 3 分割出力
    └ body.txt     : タイトル以降の本文＋ディスクレーマー
 ● 旧 output.txt は生成しない
 ● コマンドラインを省略可
+● --stream : 巨大な原稿を見出しブロック単位で逐次処理（メモリ一定・過去記事との照合なし）
+● --sections N : 長い原稿を '## ' 見出しで節に分け、N プロセスで並列に整形
+   （結果は逐次と同じ。256K 文字に満たない節には分けない）
+● --watch : 入力ファイル（--batch ならディレクトリ）を監視し、保存のたびに
+   変わった原稿の変わった段落だけ整形し直す（プロセスは起動したまま）
+● --serve : Unix ソケットで待ち受ける常駐デーモン（clean_daemon.py）
+● 保存のたびに本文を過去の記事と照合し、よく似たものがあれば警告（near_dup.py）
+   python clean_daemon.py <in> <out> で依頼すると起動・import の時間が掛からない
+● 整形規則は clean_engine.py の note プロファイル
 ────────────────────────────────────────
 """
 
 import os
 import sys
 import re
-import shutil
-from datetime import datetime
+import time
+import itertools
+from datetime import date
+from typing import Optional
 
-import webbrowser          # ブラウザ起動
-import pyperclip           # クリップボード操作
-import time 
-
-
-# -------------------------------------------------------------
-# 0  HTML ライクなペアタグ <tag>…</tag> の角括弧だけ除去
-# -------------------------------------------------------------
-HTML_PAIR = re.compile(r"<([A-Za-z][A-Za-z0-9]*)\b[^>]*>(.*?)</\1>", re.DOTALL)
-
-def strip_html_pairs(text: str) -> str:
-    prev = None
-    while prev != text:
-        prev = text
-        text = HTML_PAIR.sub(lambda m: m.group(2), text)
-    return text
-
-# -------------------------------------------------------------
-# 1  見出し行内の **bold** を除去
-# -------------------------------------------------------------
-HEADING_BOLD_LINE = re.compile(r"^(?P<prefix>[ \t]*#+\s*)(?P<body>.*)$", re.MULTILINE)
-BOLD_INLINE = re.compile(r'\*\*([^"\n]*?)\*\*')
-
-def strip_bold_in_headings(text: str) -> str:
-    def _repl(match):
-        prefix, body = match.group('prefix'), match.group('body')
-        body_clean = BOLD_INLINE.sub(r"\1", body)
-        return f"{prefix}{body_clean}"
-    return HEADING_BOLD_LINE.sub(_repl, text)
-
-# -------------------------------------------------------------
-# 2  かっこ削除（引用／URL／[] を含むもの）
-# -------------------------------------------------------------
-PAREN_PATTERN = re.compile(r"\s*\([^)]*(?:\[[^\]]+]|https?://)[^)]*\)")
-
-def clean_parentheses(text: str) -> str:
-    text = PAREN_PATTERN.sub('', text)
-    text = re.sub(r"\s*\(\s*\)", '', text)
-    text = re.sub(r"\)\s*(?=[。、，…\.\,\)]|\n|$)", '', text)
-    return re.sub(r"[ \t]{2,}", ' ', text)
-
-# -------------------------------------------------------------
-# 3 '**   xxx   **' → '**xxx**'
-# -------------------------------------------------------------
-INNER_BOLD = re.compile(r"\*\*[\s\u3000]*([^\*]+?)[\s\u3000]*\*\*")
-
-def strip_inner_spaces(text: str) -> str:
-    return INNER_BOLD.sub(lambda m: f"**{m.group(1)}**", text)
-
-# -------------------------------------------------------------
-# 4 '**xxx**' を前後 1 空白に包む
-# -------------------------------------------------------------
-def pad_bold_uniformly(text: str) -> str:
-    text = re.sub(r"\*\*([^\*]+?)\*\*", r" **\1** ", text)
-    text = re.sub(r" *\n", '\n', text)
-    text = re.sub(r"\n *", '\n', text)
-    return text
 
 # -------------------------------------------------------------
-# 5 行途中の '## ' を見出し化
+# コマンドライン（重い import より先に解析する。--help・引数の誤りでは
+#   整形エンジン・クリップボード・実行ログ保管庫を読み込まずに終わる）
 # -------------------------------------------------------------
-def ensure_heading_newline(text: str) -> str:
-    return re.sub(r"\n(?!\n)(##\s+)", r"\n\n\1", text)
+def parse_args(argv: list) -> 'argparse.Namespace':
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="note 用 Markdown クリーナー（hashtags / title / body の 3 分割出力）",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=("例:\n"
+                "  python remove.py                 # input.txt → ./output/\n"
+                "  python remove.py <in>            # <in>     → ./output/\n"
+                "  python remove.py <in> <out>      # <in>     → <out_dir|derived>/\n"
+                "  python remove.py --batch drafts/ --out out/ --workers 4\n"
+                "  python remove.py --watch         # input.txt を保存するたびに ./output/ へ\n"
+                "  python remove.py --batch drafts/ --out out/ --watch"))
+    parser.add_argument('input', nargs='?', default='input.txt')
+    parser.add_argument('output', nargs='?', default='output')
+    parser.add_argument('--stream', action='store_true',
+                        help="巨大な原稿をブロック単位で逐次処理（メモリ一定・クリップボード／類似照合なし）")
+    parser.add_argument('--profile', action='store_true',
+                        help="段ごとの時間・文字数・確保ブロック数を表示（単発モード）")
+    parser.add_argument('--profile-dump', action='store_true',
+                        help="--profile に加えて cProfile の結果を <out>/profile.prof に保存し実行ログにも添付")
+    parser.add_argument('--copy-background', action='store_true',
+                        help="クリップボードへのコピーを別スレッドで行い、待たずに進む")
+    parser.add_argument('--watch', action='store_true',
+                        help="入力（--batch ならディレクトリ）を監視し、保存のたびに変わった分だけ整形")
+    parser.add_argument('--serve', action='store_true',
+                        help="常駐デーモンとして Unix ソケットで待ち受ける（clean_daemon.py で依頼）")
+    parser.add_argument('--socket', help="--serve のソケットのパス（既定: $CLEAN_SOCKET など）")
+    parser.add_argument('--sections', type=int, default=0, metavar='N',
+                        help="長い原稿を見出しで節に分け N プロセスで並列に整形（単発モード）")
+    parser.add_argument('--batch', metavar='DIR|GLOB',
+                        help="ディレクトリ内の *.txt または glob に一致するファイルを一括処理")
+    parser.add_argument('--out', metavar='ROOT', default='output',
+                        help="--batch の出力先ルート（ファイルごとにサブディレクトリ）")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="--batch の並列プロセス数（既定: CPU 数）")
+    return parser.parse_args(argv)
 
-# -------------------------------------------------------------
-# 6 前書きを削除
-# -------------------------------------------------------------
-def drop_preamble(text: str) -> str:
-    m = re.search(r"(?m)^[ \t]*#+\s", text)
-    return text[m.start():] if m else text
 
-# -------------------------------------------------------------
-# 2a  バックスラッシュ付き '**' を正規 '**' に戻す
-# -------------------------------------------------------------
-def unescape_bold(text: str) -> str:
-    return text.replace(r"\*\*", "**")
+if __name__ == "__main__":
+    ARGS = parse_args(sys.argv[1:])               # 実行は末尾（ここでは解析だけ）
 
-# -------------------------------------------------------------
-# 7 文章中の「X月X日時点」を今日に置換
-# -------------------------------------------------------------
-AS_OF_PATTERN = re.compile(r"[0-9０-９]{1,2}月[0-9０-９]{1,2}日時点")
+from clean_engine import (BLOCK_CHARS, DISCLAIMER, PROFILES, LiveDocument, build_hashtags,
+                          iter_blocks, iter_serialized, scan_companies, set_profiler)
+from clipboard import ClipboardTimeout, CopyJob, copy_sequence, hold_seconds, open_clipboard
+from run_store import RunStore
+from stage_profile import NULL_PROFILER, StageProfiler
 
-def update_as_of_date(text: str) -> str:
-    today = datetime.now()
-    today_str = f"{today.month}月{today.day}日時点"
-    return AS_OF_PATTERN.sub(today_str, text)
+# 起動を軽くするため、使う場面が限られるモジュールは関数内で import
+#   webbrowser             : main のブラウザ起動（pyperclip は clipboard.py が遅延 import）
+#   argparse               : コマンドライン解析
+#   glob / concurrent      : --batch
+#   watch                  : --watch
+#   clean_daemon           : --serve
+#   near_dup               : 最初の保存（過去記事との照合）
 
-# -------------------------------------------------------------
-# クレンジングパイプライン
-# -------------------------------------------------------------
-def clean_text(raw: str) -> str:
-    txt = drop_preamble(raw)
-    txt = unescape_bold(txt)
-    txt = strip_html_pairs(txt)
-    txt = strip_bold_in_headings(txt)
-    txt = update_as_of_date(txt)
-    txt = clean_parentheses(txt)
-    txt = strip_inner_spaces(txt)
-    txt = pad_bold_uniformly(txt)
-    txt = ensure_heading_newline(txt)
-    return txt.rstrip('\n') + '\n'
 
 # -------------------------------------------------------------
-# 企業名・タグ関連（フルリスト）
+# 整形は clean_engine.py の note プロファイル（webapp と共通）
+#   PROFILER は --profile のときだけ StageProfiler に差し替える
+#   （エンジン側にも set_profiler で同じものを渡す）
 # -------------------------------------------------------------
-COMPANIES = [
-    'トヨタ自動車','ソニーグループ','東京エレクトロン','ソフトバンクグループ','任天堂',
-    '三菱UFJFG','三菱UFJ','ファーストリテイリング','ユニ・チャーム','武田薬品工業','三菱商事',
-    '本田技研工業','キーエンス','SUMCO','日本電信電話','NTT','バンダイナムコHD',
-    '三井住友FG','三井住友フィナンシャルグループ','セブン＆アイHD','花王','アステラス製薬','三井物産',
-    '日産自動車','日立製作所','ルネサスエレクトロニクス','KDDI','カプコン',
-    'みずほFG','イオン','キリンHD','第一三共','伊藤忠商事','スズキ','パナソニックHD',
-    'アドバンテスト','ソフトバンク','スクウェア・エニックスHD','オリックス','PPIH',
-    'アサヒグループHD','エーザイ','住友商事','マツダ','NEC','信越化学工業','メルカリ',
-    'コナミグループ','第一生命HD','ローソン','サッポロHD','中外製薬','丸紅','SUBARU',
-    '富士通','ファナック','サイバーエージェント','コーエーテクモHD','東京海上HD',
-    '三越伊勢丹HD','サントリー食品','塩野義製薬','豊田通商','三菱自動車工業',
-    'キヤノン','村田製作所','LY','野村HD','J.フロントリテイリング','日清食品HD',
-    '大塚HD','コマツ','いすゞ自動車','ニコン','ディー・エヌ・エー','SBIホールディングス',
-    '良品計画','味の素','小野薬品工業','ダイキン工業','ヤマハ発動機','三菱電機','りそなHD',
-    'ZOZO','キッコーマン','日本新薬','安川電機','日野自動車','ゆうちょ銀行','ツルハHD',
-    'カルビー','JCRファーマ','三菱重工業','日本取引所グループ','明治HD','JR東日本',
-    '大和証券G','ヤクルト本社','ANAホールディングス','日本郵政','東京電力HD',
-    '三井住友トラストHD','楽天銀行'
-]
-
-DISCLAIMER = (
-    "※本記事は銘柄に関する情報をもとに分析を行ったものであり、"
-    "特定の投資行動を推奨するものではありません。"
-    "投資に関する最終的な判断は、ご自身の責任にてお願いいたします。"
-)
-
-HASH_TAGS = (
-    "#株式投資 #株 #株価 #業績 #投資 #銘柄分析 #資産運用 #新NISA #NISA #経済 #企業"
-)
-
-def detect_company(text: str) -> str:
-    earliest_pos = len(text) + 1
-    selected = 'その他'
-    for name in COMPANIES:
-        pos = text.find(name)
-        if pos != -1 and (pos < earliest_pos or (pos == earliest_pos and len(name) > len(selected))):
-            earliest_pos = pos
-            selected = name
-            if earliest_pos == 0:
-                break
-    return selected
-
-def build_hashtags(company: str) -> str:
-    return HASH_TAGS + (f" #{company}" if company != "その他" else "")
+PROFILE  = PROFILES['note']
+PROFILER = NULL_PROFILER
+SECTIONS = 0                  # --sections N（2 以上で節ごとの並列整形）
 
 # -------------------------------------------------------------
 # 出力 & ログ保存
@@ -178,7 +108,10 @@ def save_outputs_and_logs(in_path: str,
                           hashtags: str,
                           title   : str,
                           body    : str,
-                          raw     : str) -> None:
+                          raw     : str,
+                          company : Optional[str] = None,
+                          duration_ms: Optional[float] = None) -> int:
+    """戻り値は実行ログ保管庫の run_id"""
     os.makedirs(out_dir, exist_ok=True)
 
     files = {
@@ -186,62 +119,124 @@ def save_outputs_and_logs(in_path: str,
         'title.txt'   : title,
         'body.txt'    : body,
     }
-    for fname, content in files.items():
-        with open(os.path.join(out_dir, fname), 'w', encoding='utf-8') as f:
-            f.write(content)
-
-    company = detect_company(body)
-    ts = datetime.now().strftime('%Y%m%d_%H%M%S')
-    log_dir = os.path.join('log', f'{ts}_{company}')
-    os.makedirs(log_dir, exist_ok=True)
-
-    shutil.copy2(in_path, os.path.join(log_dir, 'input.txt'))
-    for fname in files:
-        shutil.copy2(os.path.join(out_dir, fname),
-                     os.path.join(log_dir, fname))
+    with PROFILER.stage('write outputs', body):
+        for fname, content in files.items():
+            with open(os.path.join(out_dir, fname), 'w', encoding='utf-8') as f:
+                f.write(content)
+
+    if company is None:
+        company = PROFILE.detect_company(body)
+    with PROFILER.stage('save logs'):
+        run_id = save_logs(in_path, out_dir, company, duration_ms)
+    index = near_dup_index()
+    if index is not None:
+        from near_dup import article_key, report
+        article = article_key(os.path.abspath(in_path), company, date.today().isoformat())
+        with PROFILER.stage('near duplicates', body):
+            matches = index.check_and_add(run_id, article, company, body.replace(DISCLAIMER, ''))
+        report(matches, index.threshold)
+    return run_id
+
+OUTPUT_FILES = ('hashtags.txt', 'title.txt', 'body.txt')
+RUN_STORE    = RunStore()     # 旧 log/<日時>_<企業名>/ は run_store.py export で復元
+_NEAR_DUPS   = False          # 過去記事の MinHash 索引。near_dup_index() が初回に開く
+
+def near_dup_index():
+    """near_dup.py の索引（NEAR_DUP=off なら None）"""
+    global _NEAR_DUPS
+    if _NEAR_DUPS is False:
+        from near_dup import open_index
+        _NEAR_DUPS = open_index(RUN_STORE.root)
+    return _NEAR_DUPS
+
+def save_logs(in_path: str, out_dir: str, company: str,
+              duration_ms: Optional[float] = None) -> int:
+    """入力と 3 ファイルを実行ログ保管庫へ（同一内容は 1 度だけ保存）"""
+    files = {'input.txt': in_path}
+    files.update((fname, os.path.join(out_dir, fname)) for fname in OUTPUT_FILES)
+    return RUN_STORE.record('remove', company, files, duration_ms)
 
 # -------------------------------------------------------------
 # クリップボード & note 新規記事タブを開く
 # -------------------------------------------------------------
-def copy_to_clipboard_sequence(title: str, hashtags: str, body: str) -> None:
+def copy_to_clipboard_sequence(title: str, hashtags: str, body: str,
+                               background: bool = False,
+                               backend=None) -> Optional[CopyJob]:
+    """1 件ずつ paste() で届いたのを確かめてから次へ（clipboard.py）
+    background=True なら別スレッドで行い、CopyJob をすぐ返す"""
+    backend = backend or open_clipboard()
+    if backend is None:                           # CLIPBOARD=off
+        return None
     seq = [title, hashtags, body]
-    for item in seq:
-        pyperclip.copy(item)
-        # macOS: 0.5秒、Windows: 1秒くらい余裕があると安心
-        time.sleep(0.5)
+    if background:
+        return CopyJob(backend, seq, hold_seconds(), on_done=_report_copy)
+    try:
+        copy_sequence(backend, seq, hold_seconds())
+    except ClipboardTimeout as e:                 # 出力ファイルは保存済みなので続ける
+        print(f"✖ クリップボードへのコピーに失敗: {e}")
+    return None
+
+def _report_copy(job: CopyJob) -> None:
+    """バックグラウンドのコピーは失敗したときだけ知らせる"""
+    if job.error is not None:
+        print(f"✖ クリップボードへのコピーに失敗: {job.error}")
+
+
+# -------------------------------------------------------------
+# 3 分割の組み立て
+# -------------------------------------------------------------
+TITLE_MARK = re.compile(r'^[ \t]*#+\s*')
+
+def split_article(raw: str, live: Optional[LiveDocument] = None) -> tuple:
+    """raw → (company, hashtags, title, body)  ※hashtags / title は末尾改行なし
+    live を渡すと前回から変わった段落だけ整形する（--watch）"""
+    if live is not None:
+        cleaned, company = live.update_text(raw)
+        hashtags = build_hashtags(company)
+    else:
+        with PROFILER.stage('detect_company', raw):
+            company   = PROFILE.detect_company(raw)
+            hashtags  = build_hashtags(company)
+        with PROFILER.stage('clean_text', raw) as st:
+            cleaned   = PROFILE.clean_text_cached(raw, SECTIONS)
+            st.output(cleaned)
+
+    with PROFILER.stage('split title/body', cleaned) as st:
+        first_nl   = cleaned.find('\n')
+        title_line = cleaned[:first_nl].rstrip() if first_nl != -1 else cleaned.rstrip()
+        title_line = TITLE_MARK.sub('', title_line)                # ← # を除去
+
+        body_part  = cleaned[first_nl+1:].lstrip('\n') if first_nl != -1 else ''
+        body_text  = f"{body_part.rstrip()}\n\n{DISCLAIMER}\n"    # ← body は改行ありで OK
+        st.output(body_text)
+    return company, hashtags, title_line, body_text
 
 
 # -------------------------------------------------------------
 # エントリポイント
 # -------------------------------------------------------------
-def main(in_path: str, out_dir: str) -> None:
+def main(in_path: str, out_dir: str, copy_background: bool = False) -> int:
+    """戻り値は実行ログ保管庫の run_id
+    copy_background=True ならクリップボードへのコピーを待たずに戻る"""
     if not os.path.exists(in_path):
         raise FileNotFoundError(in_path)
 
-    with open(in_path, encoding="utf-8") as f:
-        raw = f.read()
-
-    company   = detect_company(raw)
-    hashtags  = build_hashtags(company) + '\n'
-    cleaned   = clean_text(raw)
+    start = time.perf_counter()
+    with PROFILER.stage('read input') as st:
+        with open(in_path, encoding="utf-8") as f:
+            raw = f.read()
+        st.output(raw)
 
-    first_nl   = cleaned.find('\n')
-    title_line = cleaned[:first_nl].rstrip() if first_nl != -1 else cleaned.rstrip()
-    title_line = re.sub(r'^[ \t]*#+\s*', '', title_line)      # ← # を除去
+    company, hashtags_no_nl, title_line, body_text = split_article(raw)
 
-    body_part  = cleaned[first_nl+1:].lstrip('\n') if first_nl != -1 else ''
-    body_text  = f"{body_part.rstrip()}\n\n{DISCLAIMER}\n"    # ← body は改行ありで OK
-
-    # ★ ここで末尾改行を落としておく
-    hashtags_no_nl = hashtags.rstrip('\n')
-    title_no_nl    = title_line           # 末尾改行は付けない
-
-    save_outputs_and_logs(
+    run_id = save_outputs_and_logs(
         in_path, out_dir,
         hashtags_no_nl,                  # ← 改行なし
-        title_no_nl,                     # ← 改行なし
+        title_line,                      # ← 改行なし
         body_text,
-        raw
+        raw,
+        company,                         # ← 検出結果を使い回す
+        (time.perf_counter() - start) * 1000
     )
     print(f"✔ 出力先: {out_dir}\n✔ ログ保存完了")
     
@@ -249,34 +244,253 @@ def main(in_path: str, out_dir: str) -> None:
     print(f"✔ 出力先: {out_dir}\n✔ ログ保存完了")
 
     # クリップボード三段コピー＋ブラウザで note を開く
-    copy_to_clipboard_sequence(title_line, hashtags_no_nl, body_text)
-    webbrowser.open_new_tab("https://note.com/notes/new")
-    print("📋 タイトル → ハッシュタグ → 本文 の順にクリップボードへコピー済み")
+    backend = open_clipboard()
+    with PROFILER.stage('clipboard'):
+        if backend is not None:
+            copy_to_clipboard_sequence(title_line, hashtags_no_nl, body_text,
+                                       copy_background, backend)
+    with PROFILER.stage('browser'):
+        import webbrowser      # ブラウザ起動
+        webbrowser.open_new_tab("https://note.com/notes/new")
+    if backend is None:
+        print("📋 クリップボードへのコピーは省略しました（CLIPBOARD=off）")
+    elif copy_background:
+        print("📋 タイトル → ハッシュタグ → 本文 の順にクリップボードへコピー中（バックグラウンド）")
+    else:
+        print("📋 タイトル → ハッシュタグ → 本文 の順にクリップボードへコピー済み")
     print("ブラウザで新規記事タブが開きました。エディタで 3 回貼り付ければ完成です！")
+    return run_id
 
 
 # -------------------------------------------------------------
-# スクリプト直接実行
+# ストリーム処理（巨大な原稿向け）
+#   原稿を見出しブロック単位で読み、規則の連鎖を通して body.txt へ
+#   逐次書き出す。メモリに載るのは構文が開いたまま結合中のブロック
+#   だけなので、原稿サイズによらずほぼ一定。出力は main と同一。
+#   ※ クリップボード・ブラウザは使わない。過去記事との照合（near_dup）も
+#     しない（本文を丸ごとメモリに載せないため。後から near_dup.py check で）
 # -------------------------------------------------------------
-if __name__ == "__main__":
-    args = sys.argv[1:]
+def prescan(in_path: str) -> tuple:
+    """1 回の読み流しで (閉じタグ名集合, 企業名) を得る
+    企業名は行をまたがないので、最初に見つかった行の先頭側を採る"""
+    company = None
+
+    def first(line: str):
+        scan = scan_companies(line)
+        return PROFILE.pick_company(scan) if scan.matches else None
+
+    def lines(f):
+        nonlocal company
+        for line in f:
+            if company is None:
+                company = first(line)
+            yield line
+
+    with open(in_path, encoding="utf-8") as f:
+        closers = PROFILE.closers(lines(f))
+        while company is None:                    # 閉じタグの収集が途中で打ち切った
+            line = f.readline()
+            if not line:
+                break
+            company = first(line)
+    return closers, company or 'その他'
+
+def write_article(chunks, out) -> str:
+    """整形済みテキストの断片列を title / body に分け、body を out へ書く
+    （split_article と同じ規則で、戻り値はタイトル行）"""
+    chunks = iter(chunks)
+    title, rest = [], ''
+    for chunk in chunks:
+        nl = chunk.find('\n')
+        if nl == -1:
+            title.append(chunk)
+            continue
+        title.append(chunk[:nl])
+        rest = chunk[nl+1:]
+        break
+    title_line = TITLE_MARK.sub('', ''.join(title).rstrip())
+
+    pending, started = '', False                  # 本文の前後の空白は落とす
+    for chunk in itertools.chain((rest,), chunks):
+        if not started:
+            chunk = chunk.lstrip('\n')
+            if not chunk:
+                continue
+            started = True
+        core = chunk.rstrip()
+        if core:
+            out.write(pending + core)
+            pending = chunk[len(core):]
+        else:
+            pending += chunk
+    out.write(f"\n\n{DISCLAIMER}\n")
+    return title_line
+
+def main_stream(in_path: str, out_dir: str) -> None:
+    if not os.path.exists(in_path):
+        raise FileNotFoundError(in_path)
+
+    start = time.perf_counter()
+    closers, company = prescan(in_path)
+    os.makedirs(out_dir, exist_ok=True)
+    with open(in_path, encoding="utf-8") as src, \
+         open(os.path.join(out_dir, 'body.txt'), 'w', encoding="utf-8") as dst:
+        blocks = PROFILE.run(iter_blocks(src, BLOCK_CHARS), closers)
+        title_line = write_article(iter_serialized(blocks), dst)
+
+    for fname, content in (('hashtags.txt', build_hashtags(company)),
+                           ('title.txt', title_line)):
+        with open(os.path.join(out_dir, fname), 'w', encoding='utf-8') as f:
+            f.write(content)
+    save_logs(in_path, out_dir, company, (time.perf_counter() - start) * 1000)
+    print(f"✔ 出力先: {out_dir}\n✔ ログ保存完了（ストリーム処理）")
 
-    input_path = 'input.txt'
-    output_dir = 'output'
 
-    if len(args) == 1:
-        input_path = args[0]
-    elif len(args) == 2:
-        input_path, out_arg = args
-        if out_arg.lower().endswith('.txt') or (os.path.exists(out_arg) and os.path.isfile(out_arg)):
-            output_dir = os.path.splitext(out_arg)[0]  # output.txt → output/
+# -------------------------------------------------------------
+# バッチ処理（ディレクトリ／glob → <out>/<ファイル名>/ の 3 ファイル）
+#   ※ クリップボード・ブラウザは使わない
+# -------------------------------------------------------------
+def collect_inputs(target: str) -> list:
+    import glob
+    if os.path.isdir(target):
+        paths = glob.glob(os.path.join(target, '*.txt'))
+    else:
+        paths = glob.glob(target, recursive=True)
+    return sorted(p for p in paths if os.path.isfile(p))
+
+def batch_out_dirs(paths: list, out_root: str) -> list:
+    """入力ファイル名ごとの出力先。同名があれば _2, _3 … を付ける"""
+    seen, dirs = {}, []
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        seen[stem] = seen.get(stem, 0) + 1
+        name = stem if seen[stem] == 1 else f"{stem}_{seen[stem]}"
+        dirs.append(os.path.join(out_root, name))
+    return dirs
+
+def process_file(in_path: str, out_dir: str) -> dict:
+    """1 ファイル分（ワーカープロセスで実行）"""
+    start = time.perf_counter()
+    with open(in_path, encoding="utf-8") as f:
+        raw = f.read()
+    company, hashtags, title, body = split_article(raw)
+    seconds = time.perf_counter() - start
+    save_outputs_and_logs(in_path, out_dir, hashtags, title, body, raw, company,
+                          seconds * 1000)
+    return {'company': company, 'seconds': seconds}
+
+def run_batch(target: str, out_root: str, workers: Optional[int] = None) -> int:
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    paths = collect_inputs(target)
+    if not paths:
+        print(f"✖ 対象ファイルがありません: {target}")
+        return 1
+
+    out_dirs = batch_out_dirs(paths, out_root)
+    results  = {}
+    start    = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process_file, p, d): p for p, d in zip(paths, out_dirs)}
+        for fut in as_completed(futures):
+            try:
+                results[futures[fut]] = fut.result()
+            except Exception as e:          # 1 件の失敗で全体を止めない
+                results[futures[fut]] = {'error': f"{type(e).__name__}: {e}"}
+    elapsed = time.perf_counter() - start
+
+    failed = 0
+    print(f"\n{'file':<40} {'status':<6} {'ms':>8}  company / error")
+    print('-' * 80)
+    for path, out_dir in zip(paths, out_dirs):
+        res = results[path]
+        if 'error' in res:
+            failed += 1
+            print(f"{path:<40} {'NG':<6} {'-':>8}  {res['error']}")
         else:
-            output_dir = out_arg
-    elif len(args) > 2:
-        print("Usage:\n"
-              "  python remove.py                 # input.txt → ./output/\n"
-              "  python remove.py <in>            # <in>     → ./output/\n"
-              "  python remove.py <in> <out>      # <in>     → <out_dir|derived>/")
-        sys.exit(1)
-
-    main(input_path, output_dir)
+            print(f"{path:<40} {'ok':<6} {res['seconds'] * 1000:8.1f}  "
+                  f"{res['company']} → {out_dir}")
+    print('-' * 80)
+    print(f"✔ {len(paths)} 件（成功 {len(paths) - failed} / 失敗 {failed}）"
+          f" 経過 {elapsed:.2f} s")
+    return 1 if failed else 0
+
+
+# -------------------------------------------------------------
+# 監視モード（--watch）
+#   プロセスと規則を起動したままにし、入力ファイル（--batch なら
+#   ディレクトリ直下の *.txt）が保存されるたびに、中身の変わった原稿
+#   だけを整形し直す。原稿ごとに LiveDocument を持つので、整形するのは
+#   前回から変わった段落（と結合で巻き込む前後）だけ。
+#   ※ クリップボード・ブラウザは使わない
+# -------------------------------------------------------------
+def main_watch(target: str, out: str) -> int:
+    """target がディレクトリなら out はルート（ファイルごとにサブディレクトリ）"""
+    from watch import Watcher, run_watch
+    if not os.path.exists(target):
+        raise FileNotFoundError(target)
+    watcher = Watcher(target)
+    docs = {}
+
+    def handle(paths: list) -> None:
+        if watcher.is_dir:
+            current = watcher.paths()
+            out_dirs = dict(zip(current, batch_out_dirs(current, out)))
+        else:
+            out_dirs = {target: out}
+        for path in paths:                        # 1 件の失敗で残りを止めない
+            start = time.perf_counter()
+            try:
+                with open(path, encoding="utf-8") as f:
+                    raw = f.read()
+                live = docs.setdefault(path, LiveDocument(PROFILE))
+                company, hashtags, title, body = split_article(raw, live)
+                save_outputs_and_logs(path, out_dirs[path], hashtags, title, body, raw, company,
+                                      (time.perf_counter() - start) * 1000)
+            except Exception as e:
+                watcher.forget(path)              # 次の保存で（中身が同じでも）やり直す
+                docs.pop(path, None)              # 途中まで更新した段落の状態は捨てる
+                print(f"✖ {path}: {type(e).__name__}: {e}")
+                continue
+            print(f"✔ {path} → {out_dirs[path]}  {(time.perf_counter() - start) * 1000:.1f} ms"
+                  f"（{len(live.keys)} ブロック中 {live.fed} を整形）  {company}")
+
+    return run_watch(watcher, handle)
+
+
+# -------------------------------------------------------------
+# スクリプト直接実行
+# -------------------------------------------------------------
+def resolve_output_dir(out_arg: str) -> str:
+    if out_arg.lower().endswith('.txt') or (os.path.exists(out_arg) and os.path.isfile(out_arg)):
+        return os.path.splitext(out_arg)[0]  # output.txt → output/
+    return out_arg
+
+
+if __name__ == "__main__":
+    if ARGS.serve:
+        from clean_daemon import serve
+        sys.exit(serve(ARGS.socket))
+    if ARGS.watch:
+        sys.exit(main_watch(ARGS.batch, ARGS.out) if ARGS.batch
+                 else main_watch(ARGS.input, resolve_output_dir(ARGS.output)))
+    if ARGS.batch:
+        sys.exit(run_batch(ARGS.batch, ARGS.out, ARGS.workers))
+    out_dir = resolve_output_dir(ARGS.output)
+    SECTIONS = ARGS.sections
+    if ARGS.stream:
+        main_stream(ARGS.input, out_dir)
+    elif ARGS.profile or ARGS.profile_dump:
+        PROFILER = StageProfiler(cprofile=ARGS.profile_dump)
+        set_profiler(PROFILER)
+        PROFILER.start()
+        try:
+            run_id = main(ARGS.input, out_dir, ARGS.copy_background)
+        finally:
+            PROFILER.stop()
+            PROFILER.report()
+        prof_path = os.path.join(out_dir, 'profile.prof')
+        if PROFILER.dump(prof_path):
+            RUN_STORE.attach(run_id, 'profile.prof', prof_path)
+            print(f"✔ cProfile: {prof_path}（run {run_id} に添付）")
+    else:
+        main(ARGS.input, out_dir, ARGS.copy_background)
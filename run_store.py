@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+run_store.py — 実行ログの保管庫（log/<日時>_<企業名>/ の置き換え）
+────────────────────────────────────────
+● 入力・出力ファイルは内容ハッシュ（sha256）で zlib 圧縮して 1 度だけ保存
+   └ 同じ原稿・同じ出力を何度流してもファイルは増えない
+● 実行ごとの索引を SQLite に記録
+   └ 日時・ツール・企業名・入力ハッシュ・出力ハッシュ・所要時間
+● 旧レイアウト（<日時>_<企業名>/input.txt …）へいつでも書き戻せる
+
+  python run_store.py list   [--company 名] [--since 日付] [--until 日付]
+  python run_store.py export <run_id> [--dest DIR]   # DIR/<日時>_<企業名>/
+  python run_store.py restore <run_id>               # log/<日時>_<企業名>/
+  python run_store.py import [log]                   # 旧 log/ を取り込む
+  ※ 保存先は ./runs（環境変数 RUN_STORE で変更）
+────────────────────────────────────────
+"""
+
+import os
+import sys
+import zlib
+import hashlib
+from datetime import datetime
+from typing import Optional
+
+DEFAULT_ROOT = 'runs'
+LEGACY_TS    = '%Y%m%d_%H%M%S'                    # 旧 log/ のディレクトリ名
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id          INTEGER PRIMARY KEY,
+    ts          TEXT NOT NULL,
+    tool        TEXT NOT NULL,
+    company     TEXT NOT NULL,
+    input_sha   TEXT NOT NULL,
+    duration_ms REAL
+);
+CREATE INDEX IF NOT EXISTS runs_company_ts ON runs(company, ts);
+CREATE INDEX IF NOT EXISTS runs_ts         ON runs(ts);
+CREATE TABLE IF NOT EXISTS run_files (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    name   TEXT    NOT NULL,
+    sha    TEXT    NOT NULL,
+    PRIMARY KEY (run_id, name)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    sha    TEXT PRIMARY KEY,
+    size   INTEGER NOT NULL,
+    stored INTEGER NOT NULL
+);
+"""
+
+
+class RunStore:
+    __slots__ = ('root', '_conn', '_pid')
+
+    def __init__(self, root: Optional[str] = None) -> None:
+        self.root = root or os.environ.get('RUN_STORE', DEFAULT_ROOT)
+        self._conn, self._pid = None, None
+
+    def _db(self) -> 'sqlite3.Connection':
+        if self._conn is None or self._pid != os.getpid():   # fork 後は開き直す
+            import sqlite3                        # 初回記録まで遅らせる（起動を軽く）
+            os.makedirs(self.root, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.root, 'index.sqlite3'), timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    # -- blob --------------------------------------------------
+    def _blob_path(self, sha: str) -> str:
+        return os.path.join(self.root, 'blobs', sha[:2], sha)
+
+    def put_blob(self, data: bytes) -> str:
+        sha = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(sha)
+        if not os.path.exists(path):
+            packed = zlib.compress(data, 6)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(packed)
+            os.replace(tmp, path)                 # 同時書き込みでも壊れない
+            with self._db() as db:
+                db.execute('INSERT OR IGNORE INTO blobs VALUES (?, ?, ?)',
+                           (sha, len(data), len(packed)))
+        return sha
+
+    def get_blob(self, sha: str) -> bytes:
+        with open(self._blob_path(sha), 'rb') as f:
+            return zlib.decompress(f.read())
+
+    # -- run ---------------------------------------------------
+    def record(self, tool: str, company: str, files: dict,
+               duration_ms: Optional[float] = None,
+               ts: Optional[datetime] = None) -> int:
+        """files: {'input.txt': パス, 'body.txt': パス, …}。戻り値は run_id"""
+        shas = {}
+        for name, path in files.items():
+            with open(path, 'rb') as f:
+                shas[name] = self.put_blob(f.read())
+        ts = (ts or datetime.now()).isoformat(timespec='seconds')
+        with self._db() as db:
+            run_id = db.execute(
+                'INSERT INTO runs (ts, tool, company, input_sha, duration_ms) VALUES (?, ?, ?, ?, ?)',
+                (ts, tool, company, shas.get('input.txt', ''), duration_ms)).lastrowid
+            db.executemany('INSERT INTO run_files VALUES (?, ?, ?)',
+                           [(run_id, name, sha) for name, sha in shas.items()])
+        return run_id
+
+    def attach(self, run_id: int, name: str, path: str) -> None:
+        """記録済みの実行にファイルを追加（プロファイル結果など）"""
+        with open(path, 'rb') as f:
+            sha = self.put_blob(f.read())
+        with self._db() as db:
+            db.execute('INSERT OR REPLACE INTO run_files VALUES (?, ?, ?)', (run_id, name, sha))
+
+    def query(self, company: Optional[str] = None,
+              since: Optional[str] = None, until: Optional[str] = None) -> list:
+        """(id, ts, tool, company, duration_ms) の一覧。日付は ISO 形式の前方一致で比較"""
+        sql, args = 'SELECT id, ts, tool, company, duration_ms FROM runs WHERE 1', []
+        if company:
+            sql += ' AND company = ?'
+            args.append(company)
+        if since:
+            sql += ' AND ts >= ?'
+            args.append(since)
+        if until:
+            sql += ' AND ts < ?'
+            args.append(until + '\uffff')         # 当日分を含める
+        return self._db().execute(sql + ' ORDER BY ts, id', args).fetchall()
+
+    def files(self, run_id: int) -> dict:
+        rows = self._db().execute('SELECT name, sha FROM run_files WHERE run_id = ?', (run_id,))
+        return dict(rows)
+
+    def export(self, run_id: int, dest: str) -> str:
+        """旧レイアウト dest/<日時>_<企業名>/ に書き戻し、そのパスを返す"""
+        row = self._db().execute('SELECT ts, company FROM runs WHERE id = ?', (run_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"run {run_id} がありません")
+        ts, company = row
+        run_dir = os.path.join(dest, f"{datetime.fromisoformat(ts).strftime(LEGACY_TS)}_{company}")
+        os.makedirs(run_dir, exist_ok=True)
+        for name, sha in self.files(run_id).items():
+            with open(os.path.join(run_dir, name), 'wb') as f:
+                f.write(self.get_blob(sha))
+        return run_dir
+
+    def import_legacy(self, log_dir: str) -> int:
+        """旧 log/<日時>_<企業名>/ を取り込む。取り込んだ件数を返す"""
+        count = 0
+        for entry in sorted(os.listdir(log_dir)):
+            run_dir = os.path.join(log_dir, entry)
+            parts = entry.split('_', 2)
+            if not os.path.isdir(run_dir) or len(parts) != 3:
+                continue
+            try:
+                ts = datetime.strptime(f"{parts[0]}_{parts[1]}", LEGACY_TS)
+            except ValueError:
+                continue
+            files = {name: os.path.join(run_dir, name) for name in sorted(os.listdir(run_dir))
+                     if os.path.isfile(os.path.join(run_dir, name))}
+            tool = 'format_gemini' if 'output.txt' in files else 'remove'
+            self.record(tool, parts[2], files, ts=ts)
+            count += 1
+        return count
+
+    def usage(self) -> tuple:
+        """(実行数, blob 数, 元の合計バイト, 圧縮後の合計バイト)"""
+        db = self._db()
+        runs = db.execute('SELECT COUNT(*) FROM runs').fetchone()[0]
+        return (runs, *db.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored), 0) FROM blobs').fetchone())
+
+
+# -------------------------------------------------------------
+# コマンドライン
+# -------------------------------------------------------------
+def main(argv: list) -> int:
+    import argparse
+    parser = argparse.ArgumentParser(description="実行ログ保管庫の一覧・書き戻し")
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('list', help="実行の一覧（企業名・期間で絞り込み）")
+    p.add_argument('--company')
+    p.add_argument('--since', metavar='YYYY-MM-DD')
+    p.add_argument('--until', metavar='YYYY-MM-DD')
+    p = sub.add_parser('export', help="旧レイアウトで書き出す")
+    p.add_argument('run_id', type=int)
+    p.add_argument('--dest', default='export')
+    p = sub.add_parser('restore', help="log/ に旧レイアウトで書き戻す")
+    p.add_argument('run_id', type=int)
+    p = sub.add_parser('import', help="旧 log/ ディレクトリを取り込む")
+    p.add_argument('log_dir', nargs='?', default='log')
+    args = parser.parse_args(argv)
+
+    store = RunStore()
+    if args.cmd == 'list':
+        rows = store.query(args.company, args.since, args.until)
+        for run_id, ts, tool, company, ms in rows:
+            dur = f"{ms:8.1f} ms" if ms is not None else f"{'-':>8}   "
+            print(f"{run_id:>6}  {ts}  {tool:<13} {dur}  {company}")
+        runs, blobs, raw, stored = store.usage()
+        print(f"✔ {len(rows)} / {runs} 件  blob {blobs} 個 "
+              f"{raw / 2**20:.1f} MB → {stored / 2**20:.1f} MB")
+    elif args.cmd in ('export', 'restore'):
+        dest = args.dest if args.cmd == 'export' else 'log'
+        print(f"✔ {store.export(args.run_id, dest)}")
+    else:
+        print(f"✔ {store.import_legacy(args.log_dir)} 件を取り込みました")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+stage_profile.py — 段ごとの計測（remove.py / format_gemini.py の --profile）
+────────────────────────────────────────
+● with PROFILER.stage('名前', 入力) as st: … st.output(出力)
+   └ 経過時間・入出力の文字数・確保ブロック数の増減（sys.getallocatedblocks）
+● 入れ子の段は字下げして表示
+● cProfile の結果（.prof）も取れる（実行ログ保管庫に添付）
+● 無効時は NULL_PROFILER（何もしない共有オブジェクト）なので、
+   計測箇所のコストは属性参照とメソッド呼び出し 1 回だけ
+────────────────────────────────────────
+"""
+
+import sys
+import time
+
+
+def data_size(data) -> int:
+    """文字列はその長さ、ブロック列は text の合計長"""
+    if data is None:
+        return 0
+    if isinstance(data, str):
+        return len(data)
+    return sum(len(getattr(item, 'text', item)) for item in data)
+
+
+class StageRecord:
+    __slots__ = ('name', 'depth', 'seconds', 'size_in', 'size_out', 'blocks')
+
+    def __init__(self, name: str, depth: int, size_in: int) -> None:
+        self.name, self.depth, self.size_in = name, depth, size_in
+        self.seconds, self.size_out, self.blocks = 0.0, 0, 0
+
+
+class _Stage:
+    __slots__ = ('profiler', 'record', '_t0', '_b0')
+
+    def __init__(self, profiler: 'StageProfiler', record: StageRecord) -> None:
+        self.profiler, self.record = profiler, record
+
+    def __enter__(self) -> '_Stage':
+        self.profiler._depth += 1
+        self._b0 = sys.getallocatedblocks()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.record.seconds = time.perf_counter() - self._t0
+        self.record.blocks = sys.getallocatedblocks() - self._b0
+        self.profiler._depth -= 1
+
+    def output(self, data) -> None:
+        self.record.size_out = data_size(data)
+
+
+class StageProfiler:
+    enabled = True
+
+    def __init__(self, cprofile: bool = False) -> None:
+        self.records = []
+        self._depth = 0
+        self._cprofile = None
+        if cprofile:
+            import cProfile
+            self._cprofile = cProfile.Profile()
+
+    def stage(self, name: str, data=None) -> _Stage:
+        record = StageRecord(name, self._depth, data_size(data))
+        self.records.append(record)
+        return _Stage(self, record)
+
+    # -- cProfile ----------------------------------------------
+    def start(self) -> None:
+        if self._cprofile is not None:
+            self._cprofile.enable()
+
+    def stop(self) -> None:
+        if self._cprofile is not None:
+            self._cprofile.disable()
+
+    def dump(self, path: str) -> bool:
+        """cProfile の結果を path へ。cProfile を使っていなければ False"""
+        if self._cprofile is None:
+            return False
+        self._cprofile.dump_stats(path)
+        return True
+
+    # -- 表示 --------------------------------------------------
+    def report(self, out=None) -> None:
+        out = out or sys.stdout
+        total = sum(r.seconds for r in self.records if r.depth == 0) or 1e-9
+        print(f"\n{'stage':<32} {'ms':>9} {'%':>6} {'in chars':>10} "
+              f"{'out chars':>10} {'alloc blocks':>13}", file=out)
+        print('-' * 85, file=out)
+        for r in self.records:
+            name = '  ' * r.depth + r.name
+            print(f"{name:<32} {r.seconds * 1000:9.2f} {r.seconds / total * 100:6.1f} "
+                  f"{r.size_in:>10} {r.size_out:>10} {r.blocks:>+13}", file=out)
+        print('-' * 85, file=out)
+        print(f"{'total':<32} {total * 1000:9.2f}", file=out)
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self) -> '_NullStage':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def output(self, data) -> None:
+        pass
+
+
+class NullProfiler:
+    """--profile なしのときの既定（何も記録しない）"""
+    enabled = False
+    __slots__ = ()
+    _STAGE = _NullStage()
+
+    def stage(self, name: str, data=None) -> _NullStage:
+        return self._STAGE
+
+
+NULL_PROFILER = NullProfiler()
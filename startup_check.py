@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+startup_check.py ― 起動時間の予算チェック
+
+● 新しいプロセスで各コマンドを数回起動し、最速値を測る
+   ├ remove.py --help       : 素の python 起動との差
+   ├ clean_daemon.py --help : 同上（デーモンへ依頼する薄いクライアント）
+   └ webapp の app 読み込み : import flask との差（Flask 自体の重さは除く）
+● 差が予算（ミリ秒）を超えたら失敗し、python -X importtime で
+   重いモジュールの上位を表示する
+
+  python startup_check.py            # make startup-check
+  python startup_check.py --runs 15
+"""
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+ROOT   = os.path.dirname(os.path.abspath(__file__))
+WEBAPP = os.path.join(ROOT, 'webapp')
+
+# 名前: (作業ディレクトリ, 基準コマンド, 計測コマンド, 予算 ms)
+#   予算は 2026-10 時点の実測（remove.py --help で素の起動 +50 ms 程度、
+#   遅延 import 前は +98 ms）に余裕を見たもの。remove.py は引数を解析してから
+#   整形エンジンなどを読み込むので、--help は argparse（と re）の分だけ
+#   （+35〜40 ms）。引数解析より前に重い import を足すとここで落ちる
+CHECKS = {
+    'remove.py --help': (ROOT, ['-c', 'pass'], ['remove.py', '--help'], 70),
+    'clean_daemon.py --help': (ROOT, ['-c', 'pass'], ['clean_daemon.py', '--help'], 15),
+    'webapp app':       (WEBAPP, ['-c', 'import flask'], ['-c', 'import app'], 75),
+}
+
+
+def best_ms(cwd: str, args: list, runs: int) -> float:
+    """最速の起動時間（ms）。失敗したら CalledProcessError"""
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=cwd, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best
+
+def heaviest_imports(cwd: str, args: list, top: int = 10) -> list:
+    """-X importtime の累積時間が大きい順に (μs, モジュール名)"""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', *args], cwd=cwd,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main(argv: list) -> int:
+    parser = argparse.ArgumentParser(description="起動時間の予算チェック")
+    parser.add_argument('--runs', type=int, default=9)
+    parser.add_argument('--strict', action='store_true',
+                        help="依存が無くて計測できない項目も失敗扱いにする")
+    args = parser.parse_args(argv)
+
+    failed = skipped = 0
+    print(f"{'check':<20} {'base ms':>9} {'ms':>9} {'overhead':>9} {'budget':>8}")
+    for name, (cwd, base_cmd, cmd, budget) in CHECKS.items():
+        try:
+            base = best_ms(cwd, base_cmd, args.runs)
+            cost = best_ms(cwd, cmd, args.runs)
+        except subprocess.CalledProcessError as e:
+            skipped += 1
+            print(f"{name:<20} 計測できません（{' '.join(e.cmd[1:])} が失敗。依存未導入？）")
+            continue
+        over = cost - base
+        ok = over <= budget
+        print(f"{name:<20} {base:9.1f} {cost:9.1f} {over:+9.1f} {budget:8d}  {'ok' if ok else 'NG'}")
+        if not ok:
+            failed += 1
+            for us, module in heaviest_imports(cwd, cmd):
+                print(f"    {us / 1000:8.1f} ms  {module}")
+
+    if failed or (skipped and args.strict):
+        print(f"✖ 予算超過 {failed} 件 / 計測不可 {skipped} 件")
+        return 1
+    print("✔ 起動時間は予算内です")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+watch.py — 入力ファイル／原稿ディレクトリの監視（remove.py・format_gemini.py の --watch）
+────────────────────────────────────────
+● 標準ライブラリだけのポーリング（POLL_INTERVAL ごとに stat するだけで中身は読まない）
+   └ inotify は外部ライブラリが要るので使わない。対象は 1 ファイルか
+      ディレクトリ直下の *.txt なので stat の手間は無視できる
+● 変更を見つけても DEBOUNCE 秒静かになるまで待ってから 1 回だけ実行
+   （エディタの連続保存・書き込み途中を拾わない）
+● 保存し直しただけで中身が同じファイルは実行しない（内容ハッシュ）
+● プロセス・コンパイル済みの規則は起動したままなので、2 回目以降は
+   インタプリタの起動も import も無い
+────────────────────────────────────────
+"""
+
+import os
+import time
+import fnmatch
+import hashlib
+
+POLL_INTERVAL = 0.1           # stat を取り直す間隔（秒）
+DEBOUNCE      = 0.3           # 最後の変更からこれだけ静かになったら実行（秒）
+
+
+def _digest(path: str):
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).digest()
+    except OSError:                               # 読む前に消えた・置き換え中
+        return None
+
+
+class Watcher:
+    """target: 監視するファイル、またはディレクトリ（直下の pattern に一致するもの）"""
+
+    def __init__(self, target: str, pattern: str = '*.txt',
+                 interval: float = POLL_INTERVAL, debounce: float = DEBOUNCE) -> None:
+        self.target, self.pattern = target, pattern
+        self.interval, self.debounce = interval, debounce
+        self.is_dir = os.path.isdir(target)
+        self.stats = self._scan()
+        self.digests = {path: _digest(path) for path in self.stats}
+
+    def _scan(self) -> dict:
+        """{パス: (mtime_ns, サイズ)}"""
+        if not self.is_dir:
+            try:
+                st = os.stat(self.target)
+            except FileNotFoundError:
+                return {}
+            return {self.target: (st.st_mtime_ns, st.st_size)}
+        found = {}
+        with os.scandir(self.target) as it:
+            for entry in it:
+                if fnmatch.fnmatch(entry.name, self.pattern) and entry.is_file():
+                    st = entry.stat()
+                    found[entry.path] = (st.st_mtime_ns, st.st_size)
+        return found
+
+    def paths(self) -> list:
+        return sorted(self.stats)
+
+    def forget(self, path: str) -> None:
+        """処理に失敗したファイル。次に保存されれば中身が同じでも返す"""
+        self.digests.pop(path, None)
+
+    def wait(self) -> list:
+        """変更が落ち着くまで待ち、中身が変わったファイル（新規を含む）を返す"""
+        pending, last = set(), 0.0
+        while True:
+            time.sleep(self.interval)
+            now = self._scan()
+            changed = {p for p, st in now.items() if self.stats.get(p) != st}
+            changed |= self.stats.keys() - now.keys()
+            self.stats = now
+            if changed:
+                pending |= changed
+                last = time.monotonic()
+                continue
+            if not pending or time.monotonic() - last < self.debounce:
+                continue
+            ready = []
+            for path in sorted(pending):
+                if path not in now:
+                    self.digests.pop(path, None)  # 削除
+                    continue
+                digest = _digest(path)
+                if digest is not None and digest != self.digests.get(path):
+                    self.digests[path] = digest
+                    ready.append(path)
+            pending = set()
+            if ready:
+                return ready
+
+
+def run_watch(watcher: Watcher, handle) -> int:
+    """handle(変更されたパスの列) を初回は全ファイル、以後は変更のたびに呼ぶ
+    1 回の失敗では止めない。Ctrl+C で終了"""
+    paths = watcher.paths()
+    print(f"👀 監視中: {watcher.target}（{len(paths)} 件・Ctrl+C で終了）")
+    try:
+        while True:
+            if paths:
+                start = time.perf_counter()
+                try:
+                    handle(paths)
+                except Exception as e:
+                    print(f"✖ {type(e).__name__}: {e}")
+                else:
+                    print(f"⏱ {len(paths)} 件 {(time.perf_counter() - start) * 1000:.1f} ms")
+            paths = watcher.wait()
+    except KeyboardInterrupt:
+        print("\n✔ 監視を終了しました")
+        return 0
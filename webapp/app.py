@@ -1,8 +1,201 @@
-from flask import Flask, render_template, request, jsonify
+from flask import (Flask, Response, g, has_request_context, render_template, request, jsonify,
+                   stream_with_context)
+import os
 import re
-import remove  # 同フォルダの既存クリーナーを利用
+import sys
+import io
+import gzip
+import json
+import time
+import zlib
+import hashlib
+import secrets
+import threading
+from collections import OrderedDict
+
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+
+# 整形エンジンなどの共有モジュールはリポジトリ直下に置いている
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clean_cache import source_version
+from clean_engine import (CLEAN_CACHE, DISCLAIMER, PIPELINE_VERSION, PROFILES, LiveDocument,
+                          build_hashtags, company_dict, morph_scanner, today_as_of)
+from metrics import BYTE_BUCKETS, CONTENT_TYPE, Registry
+
+MAX_BATCH    = 500                                # /clean/batch 1 回あたりの上限
+MAX_INFLATED = 32 * 2**20                         # gzip 要求本文の展開後の上限
+GZIP_MIN     = 512                                # これより小さい応答は圧縮しない
+APP_VERSION  = source_version(__file__)           # 応答の組み立て方も ETag に含める
+PROFILE      = PROFILES["note"]                    # remove.py と同じ整形規則
+LIVE_MAX     = int(os.environ.get("LIVE_SESSIONS", "64"))   # ライブプレビューの保持数
+_pool = None                                      # 初回の一括処理で起動
+_pool_lock = threading.Lock()                     # 同時の初回要求で 2 つ作らない
+_live = OrderedDict()                             # セッション ID → (ロック, LiveDocument)
+_live_lock = threading.Lock()
+
+
+# -------------------------------------------------------------
+# メトリクス（/metrics で Prometheus 形式。このプロセスの分だけ）
+#   一括処理はワーカープロセスで整形するので、段ごとの時間は取らず
+#   1 件ごとの所要時間・キャッシュの当否を結果から受け取って数える
+# -------------------------------------------------------------
+METRICS   = Registry()
+REQUESTS  = METRICS.histogram("webapp_request_seconds", "要求 1 件の処理時間（応答の送信完了まで）",
+                              ("endpoint", "method", "status"))
+STAGES    = METRICS.histogram("webapp_stage_seconds", "要求内の段ごとの処理時間",
+                              ("endpoint", "stage"))
+IN_BYTES  = METRICS.histogram("webapp_request_bytes", "要求本文のバイト数（gzip 展開後）",
+                              ("endpoint",), BYTE_BUCKETS)
+IN_FLIGHT = METRICS.gauge("webapp_requests_in_flight", "処理中の要求数", ("endpoint",))
+ERRORS    = METRICS.counter("webapp_errors_total", "エラー応答（4xx/5xx）と一括処理の失敗件数",
+                            ("endpoint", "reason"))
+COMPANIES = METRICS.counter("webapp_company_total", "判定した企業名ごとの原稿数（その他 = 未検出）",
+                            ("company",))
+CACHE     = METRICS.counter("webapp_clean_cache_total", "整形結果キャッシュの参照回数",
+                            ("result",))
+LIVE      = METRICS.gauge("webapp_live_sessions", "保持しているライブプレビューのセッション数")
+_worker_cache = {"hit": 0, "miss": 0}             # 一括処理のワーカーでの参照回数
+_worker_cache_lock = threading.Lock()
+
+
+@METRICS.collect
+def _collect() -> None:
+    """取得時にだけ読めばよい値を写す"""
+    hits = CLEAN_CACHE.hits if CLEAN_CACHE is not None else 0
+    misses = CLEAN_CACHE.misses if CLEAN_CACHE is not None else 0
+    CACHE.labels("hit").set(hits + _worker_cache["hit"])
+    CACHE.labels("miss").set(misses + _worker_cache["miss"])
+    LIVE.set(len(_live))
+
+
+def endpoint_name() -> str:
+    """ラベル用。ルートに一致しない要求は 1 つにまとめる（値の種類を増やさない）"""
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+class GunzipRequest:
+    """Content-Encoding: gzip の要求本文を展開してから Flask に渡す"""
+
+    def __init__(self, wsgi_app) -> None:
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        if environ.get("HTTP_CONTENT_ENCODING", "").lower() == "gzip":
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+            body = environ["wsgi.input"].read(length) if length else environ["wsgi.input"].read()
+            inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            try:
+                data = inflater.decompress(body, MAX_INFLATED + 1)
+            except zlib.error:
+                return BadRequest("gzip を展開できません")(environ, start_response)
+            if len(data) > MAX_INFLATED or inflater.unconsumed_tail:
+                return RequestEntityTooLarge()(environ, start_response)
+            environ["wsgi.input"] = io.BytesIO(data)
+            environ["CONTENT_LENGTH"] = str(len(data))
+            del environ["HTTP_CONTENT_ENCODING"]
+        return self.wsgi_app(environ, start_response)
+
 
 app = Flask(__name__)
+app.wsgi_app = GunzipRequest(app.wsgi_app)
+
+if morph_scanner() is not None:                   # 辞書の読み込みで最初の要求を待たせない
+    threading.Thread(target=morph_scanner().warm, daemon=True).start()
+
+
+TITLE_MARK = re.compile(r"^[ \t]*#+\s*")
+
+def clean_document(raw: str) -> dict:
+    """1 原稿を title / body / hashtags / company に（/clean と /clean/batch 共通）"""
+    endpoint = endpoint_name() if has_request_context() else "batch"
+    with STAGES.labels(endpoint, "clean").time():
+        cleaned = PROFILE.clean_text_cached(raw)  # 同じ原稿はキャッシュから
+    with STAGES.labels(endpoint, "company").time():
+        company = PROFILE.detect_company(raw)
+    COMPANIES.labels(company).inc()
+    with STAGES.labels(endpoint, "assemble").time():
+        return assemble(cleaned, company)
+
+
+def assemble(cleaned: str, company: str) -> dict:
+    """整形結果の 1 行目をタイトル、残りに免責文を付けて本文にする"""
+    first_nl = cleaned.find("\n")
+    title = cleaned[:first_nl].strip() if first_nl != -1 else cleaned.strip()
+    title = TITLE_MARK.sub("", title)
+
+    body_part = cleaned[first_nl + 1 :].lstrip() if first_nl != -1 else ""
+    body = f"{body_part.strip()}\n\n{DISCLAIMER}\n"
+
+    hashtags = build_hashtags(company)
+
+    return {"title": title, "body": body, "hashtags": hashtags, "company": company}
+
+
+def _clean_one(index: int, doc_id, raw: str) -> dict:
+    """ワーカープロセスで 1 件分（結果に番号・所要時間を付ける）"""
+    start = time.perf_counter()
+    hits = CLEAN_CACHE.hits if CLEAN_CACHE is not None else 0
+    result = {"index": index, "id": doc_id}
+    if not raw.strip():
+        result["error"] = "empty"
+    else:
+        result.update(clean_document(raw))
+        if CLEAN_CACHE is not None:               # 親プロセスで数えて取り除く
+            result["_cache_hit"] = CLEAN_CACHE.hits > hits
+    result["ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return result
+
+
+def _parse_batch(data: bytes, content_type: str) -> list:
+    """JSON 配列または NDJSON → [(id, markdown), …]
+    要素は文字列か {"id": …, "markdown": …}"""
+    text = data.decode("utf-8")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        items = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        items = json.loads(text)
+        if not isinstance(items, list):
+            raise ValueError("JSON 配列を送ってください")
+    docs = []
+    for i, item in enumerate(items):
+        if isinstance(item, str):
+            docs.append((i, item))
+        elif isinstance(item, dict) and isinstance(item.get("markdown"), str):
+            docs.append((item.get("id", i), item["markdown"]))
+        else:
+            raise ValueError(f"{i} 件目: 文字列か {{\"markdown\": …}} が必要です")
+    return docs
+
+
+def _executor():
+    global _pool
+    if _pool is not None:
+        return _pool
+    with _pool_lock:
+        if _pool is None:
+            import multiprocessing                           # 一括処理を使うときだけ
+            from concurrent.futures import ProcessPoolExecutor
+            workers = int(os.environ.get("CLEAN_WORKERS", "0")) or None   # 既定: CPU 数
+            # スレッドで動くサーバーから fork すると、他のスレッドが持っていたロック
+            # （メトリクス・セッション・形態素解析の準備など）を持ったままの子ができる。
+            # fork しない起動方法で、子はこのモジュールを読み込み直して始める
+            method = ("forkserver" if "forkserver" in multiprocessing.get_all_start_methods()
+                      else "spawn")
+            _pool = ProcessPoolExecutor(max_workers=workers,
+                                        mp_context=multiprocessing.get_context(method))
+    return _pool
+
+
+def document_etag(raw: str) -> str:
+    """原稿・パイプライン版・企業辞書の版・企業名の照合方式・置換日付から決まる
+    強い ETag（引用符なし）。辞書の CSV や COMPANY_MORPH を変えて再起動すれば変わる"""
+    morph = "morph" if morph_scanner() is not None else "plain"
+    h = hashlib.sha256(f"{PIPELINE_VERSION}\0{PROFILE.name}\0{APP_VERSION}\0"
+                       f"{company_dict().version}\0{morph}\0{today_as_of()}\0".encode("utf-8"))
+    h.update(raw.encode("utf-8"))
+    return h.hexdigest()[:32]
+
 
 @app.route("/")
 def index():
@@ -14,19 +207,157 @@ def clean():
     if not raw.strip():
         return jsonify({"error": "empty"}), 400
 
-    # remove.py の関数を活用
-    cleaned = remove.clean_text(raw)
-    first_nl = cleaned.find("\n")
-    title = cleaned[:first_nl].strip() if first_nl != -1 else cleaned.strip()
-    title = re.sub(r"^[ \t]*#+\s*", "", title)
+    with STAGES.labels("/clean", "etag").time():
+        etag = document_etag(raw)
+    for tag in (etag, etag + "-gz"):              # gzip 応答では接尾辞付き
+        if request.if_none_match.contains(tag):
+            resp = Response(status=304)           # 整形せずに返す
+            resp.set_etag(tag)
+            return resp
 
-    body_part = cleaned[first_nl + 1 :].lstrip() if first_nl != -1 else ""
-    body = f"{body_part.strip()}\n\n{remove.DISCLAIMER}\n"
+    result = clean_document(raw)
+    del result["company"]
+    resp = jsonify(result)
+    resp.set_etag(etag)
+    return resp
+
+def live_session(sid):
+    """既存のセッション（無ければ新規）。使われていない順に LIVE_MAX 件を超えた分を捨てる"""
+    with _live_lock:
+        entry = _live.get(sid) if sid else None
+        if entry is None:
+            sid = secrets.token_urlsafe(12)
+            entry = _live[sid] = (threading.Lock(), LiveDocument(PROFILE))
+            while len(_live) > LIVE_MAX:
+                _live.popitem(last=False)
+        else:
+            _live.move_to_end(sid)
+    return sid, entry
+
+@app.route("/clean/live", methods=["POST"])
+def clean_live():
+    """ライブプレビュー用の差分整形
+    要求: {"session": ID|null, "paragraphs": [段落 ID, …], "texts": {段落 ID: 原文}}
+    段落は原稿を行頭 '#' の直前で区切ったもの。texts にはサーバーがまだ
+    持っていない段落だけを入れる（足りなければ 409 と missing を返す）"""
+    req = request.get_json(silent=True)
+    if not isinstance(req, dict) or not isinstance(req.get("paragraphs"), list) \
+            or not isinstance(req.get("texts", {}), dict):
+        return jsonify({"error": "paragraphs と texts を JSON で送ってください"}), 400
+    ids, texts = req["paragraphs"], req.get("texts", {})
+    if not all(isinstance(pid, str) for pid in ids) \
+            or not all(isinstance(text, str) for text in texts.values()):
+        return jsonify({"error": "段落 ID と原文は文字列です"}), 400
+
+    sid, (lock, doc) = live_session(req.get("session"))
+    with lock:
+        missing = doc.missing(ids, texts)
+        if missing:
+            return jsonify({"error": "missing", "session": sid, "missing": missing}), 409
+        with STAGES.labels("/clean/live", "live_update").time():
+            cleaned, company = doc.update(ids, texts)
+        fed, blocks = doc.fed, len(doc.keys)
+    if not cleaned.strip():
+        return jsonify({"error": "empty", "session": sid}), 400
+
+    COMPANIES.labels(company).inc()
+    result = assemble(cleaned, company)
+    del result["company"]
+    result.update(session=sid, blocks=blocks, recomputed=fed)
+    return jsonify(result)
+
+@app.route("/clean/batch", methods=["POST"])
+def clean_batch():
+    """複数原稿を並列に整形し、終わった順に 1 行 1 件の NDJSON で返す"""
+    try:
+        docs = _parse_batch(request.get_data(), request.content_type or "")
+    except (UnicodeDecodeError, ValueError) as e:          # json.JSONDecodeError も含む
+        return jsonify({"error": str(e)}), 400
+    if len(docs) > MAX_BATCH:
+        return jsonify({"error": f"1 回 {MAX_BATCH} 件までです"}), 413
+
+    from concurrent.futures import as_completed
+
+    futures = [_executor().submit(_clean_one, i, doc_id, raw)
+               for i, (doc_id, raw) in enumerate(docs)]
+
+    def generate():
+        try:
+            for fut in as_completed(futures):
+                try:
+                    result = fut.result()
+                except Exception as e:                    # 1 件の失敗で全体を止めない
+                    i = futures.index(fut)
+                    result = {"index": i, "id": docs[i][0], "error": f"{type(e).__name__}: {e}"}
+                record_batch_result(result)
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+        finally:
+            for fut in futures:                           # 切断されたら残りは捨てる
+                fut.cancel()
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+def record_batch_result(result: dict) -> None:
+    """一括処理 1 件分の結果をメトリクスへ（内部用の項目は取り除く）"""
+    hit = result.pop("_cache_hit", None)
+    if hit is not None:
+        with _worker_cache_lock:
+            _worker_cache["hit" if hit else "miss"] += 1
+    if "error" in result:
+        ERRORS.labels("/clean/batch", "document").inc()
+        return
+    STAGES.labels("/clean/batch", "document").observe(result["ms"] / 1000)
+    COMPANIES.labels(result["company"]).inc()
+
+@app.route("/metrics")
+def metrics():
+    return Response(METRICS.render(), content_type=CONTENT_TYPE)
+
+@app.before_request
+def start_metrics():
+    g.metrics_start = time.perf_counter()
+    g.endpoint = endpoint_name()
+    IN_FLIGHT.labels(g.endpoint).inc()
+    if request.content_length:
+        IN_BYTES.labels(g.endpoint).observe(request.content_length)
+
+# after_request は登録と逆順に呼ばれるので、compress より先に登録して
+# 圧縮も含めた時間を測る。ストリーム応答は送り終えて閉じたときに記録
+@app.after_request
+def finish_metrics(resp):
+    endpoint, start = g.get("endpoint"), g.get("metrics_start")
+    if endpoint is None:
+        return resp
+    method, status = request.method, str(resp.status_code)
+    if resp.status_code >= 400:
+        ERRORS.labels(endpoint, status).inc()
+
+    def record() -> None:
+        REQUESTS.labels(endpoint, method, status).observe(time.perf_counter() - start)
+        IN_FLIGHT.labels(endpoint).dec()
 
-    company = remove.detect_company(raw)
-    hashtags = remove.build_hashtags(company)
+    resp.call_on_close(record)
+    return resp
 
-    return jsonify({"title": title, "body": body, "hashtags": hashtags})
+@app.after_request
+def compress(resp):
+    """Accept-Encoding に gzip があれば応答を圧縮（ストリーム応答・ファイルは除く）"""
+    if resp.status_code != 200 or resp.is_streamed or resp.direct_passthrough \
+            or "Content-Encoding" in resp.headers:
+        return resp
+    resp.vary.add("Accept-Encoding")
+    if not request.accept_encodings["gzip"]:
+        return resp
+    data = resp.get_data()
+    if len(data) < GZIP_MIN:
+        return resp
+    with STAGES.labels(g.get("endpoint", "unmatched"), "gzip").time():
+        resp.set_data(gzip.compress(data, 6))
+    resp.headers["Content-Encoding"] = "gzip"
+    etag, weak = resp.get_etag()
+    if etag:
+        resp.set_etag(etag + "-gz", weak)         # 符号化ごとに別の表現
+    return resp
 
 if __name__ == "__main__":
     app.run(debug=True, host="0.0.0.0", port=5005)
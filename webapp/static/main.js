@@ -2,6 +2,18 @@
 const errMsg = document.getElementById("err");
 const output = document.getElementById("output");
 
+// 直前の変換結果（原稿が同じならサーバーは 304 を返す）
+let last = { etag: null, data: null };
+
+// 1 KB 以上の本文は gzip で送る（CompressionStream 非対応ブラウザはそのまま）
+async function encodeBody(text) {
+  if (text.length < 1024 || !("CompressionStream" in window)) {
+    return { body: text, headers: {} };
+  }
+  const gz = new Blob([text]).stream().pipeThrough(new CompressionStream("gzip"));
+  return { body: await new Response(gz).blob(), headers: { "Content-Encoding": "gzip" } };
+}
+
 document.getElementById("run").addEventListener("click", async () => {
   const md = document.getElementById("input").value.trim();
   if (!md) {
@@ -11,19 +23,98 @@ document.getElementById("run").addEventListener("click", async () => {
   errMsg.classList.add("hidden");
 
   // Flask へ POST
-  const resp = await fetch("/clean", {
-    method: "POST",
-    headers: { "Content-Type": "application/x-www-form-urlencoded" },
-    body: new URLSearchParams({ markdown: md })
-  });
+  const { body, headers } = await encodeBody(new URLSearchParams({ markdown: md }).toString());
+  headers["Content-Type"] = "application/x-www-form-urlencoded";
+  if (last.etag) headers["If-None-Match"] = last.etag;
+  const resp = await fetch("/clean", { method: "POST", headers, body });
 
-  if (!resp.ok) { alert("サーバーエラー"); return; }
+  let data;
+  if (resp.status === 304 && last.data) {
+    data = last.data;                                 // 変更なし：前回の結果を使う
+  } else if (!resp.ok) {
+    alert("サーバーエラー"); return;
+  } else {
+    data = await resp.json();
+    last = { etag: resp.headers.get("ETag"), data };
+  }
+  show(data);
+});
 
-  const data = await resp.json();
+function show(data) {
   document.getElementById("title").value    = data.title;
   document.getElementById("body").value     = data.body;
   document.getElementById("hashtags").value = data.hashtags;
   output.classList.remove("hidden");
+}
+
+// ライブプレビュー：入力が止まったら、サーバーがまだ持っていない段落だけ送る
+// （段落は行頭 '#' の直前で区切る。サーバーは段落ごとの整形結果を覚えていて、
+//   変わった段落とその前後だけ整形し直す）
+const LIVE_DELAY = 150;                               // 入力が止まってから送るまで（ms）
+const live = { session: null, known: new Set(), timer: null, busy: false, again: false };
+
+function splitParagraphs(md) {
+  return md.split(/(?<=\n)(?=#)/);
+}
+
+// 段落 ID：53 bit ハッシュ＋長さ（crypto.subtle は http では使えないため自前）
+function paragraphId(text) {
+  let h1 = 0xdeadbeef, h2 = 0x41c6ce57;
+  for (let i = 0; i < text.length; i++) {
+    const ch = text.charCodeAt(i);
+    h1 = Math.imul(h1 ^ ch, 2654435761);
+    h2 = Math.imul(h2 ^ ch, 1597334677);
+  }
+  h1 = Math.imul(h1 ^ (h1 >>> 16), 2246822507) ^ Math.imul(h2 ^ (h2 >>> 13), 3266489909);
+  h2 = Math.imul(h2 ^ (h2 >>> 16), 2246822507) ^ Math.imul(h1 ^ (h1 >>> 13), 3266489909);
+  const h = 4294967296 * (2097151 & h2) + (h1 >>> 0);
+  return h.toString(36) + "-" + text.length.toString(36);
+}
+
+async function postLive(paragraphs, texts) {
+  const { body, headers } = await encodeBody(
+    JSON.stringify({ session: live.session, paragraphs, texts }));
+  headers["Content-Type"] = "application/json";
+  return fetch("/clean/live", { method: "POST", headers, body });
+}
+
+async function liveUpdate() {
+  if (live.busy) { live.again = true; return; }      // 送信中の入力は終わってから 1 回
+  const md = document.getElementById("input").value.trim();
+  if (!md) return;
+  live.busy = true;
+  try {
+    const paras = splitParagraphs(md);
+    const ids   = paras.map(paragraphId);
+    const texts = {};
+    ids.forEach((id, i) => { if (!live.known.has(id)) texts[id] = paras[i]; });
+    let resp = await postLive(ids, texts);
+    if (resp.status === 409) {                        // セッション切れなど：足りない分を送る
+      const miss = await resp.json();
+      live.session = miss.session;
+      const again = {};
+      for (const id of miss.missing) again[id] = paras[ids.indexOf(id)];
+      resp = await postLive(ids, again);
+    }
+    if (!resp.ok) { live.known.clear(); return; }
+    const data = await resp.json();
+    live.session = data.session;
+    live.known   = new Set(ids);
+    errMsg.classList.add("hidden");
+    show(data);
+  } finally {
+    live.busy = false;
+    if (live.again) { live.again = false; liveUpdate(); }
+  }
+}
+
+document.getElementById("input").addEventListener("input", () => {
+  if (!document.getElementById("live").checked) return;
+  clearTimeout(live.timer);
+  live.timer = setTimeout(liveUpdate, LIVE_DELAY);
+});
+document.getElementById("live").addEventListener("change", (e) => {
+  if (e.target.checked) liveUpdate();
 });
 
 // クリップボード